@@ -0,0 +1,116 @@
+""" Stage-level benchmark of the pipeline on synthetic data (see synthetic.py).
+
+    Runs every stage of main() one by one on 10K / 1M / 10M generated rows, offline,
+    in a scratch workspace, and records the wall time and the peak memory growth
+    of each stage through the run report of instrumentation.py. The results are
+    compared against a stored baseline: a stage that got slower or hungrier than the
+    tolerance allows is reported as a regression.
+
+    Usage: python project/benchmark.py [--sizes 10k,1m] [--save-baseline] [--tolerance 0.25]
+
+    """
+
+import os
+import sys
+import json
+import argparse
+
+import synthetic
+from instrumentation import RunReport
+
+DEFAULT_WORKSPACE = './data/benchmark'
+BASELINE_FILE = 'baseline.json'
+# differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.1
+MIN_PEAK_MB = 5.0
+
+
+def run_benchmark(rows, workspace=DEFAULT_WORKSPACE, **settings):
+    """ {stage name: {seconds, peak_mb}} of one pipeline run on `rows` synthetic rows.
+        settings: pipeline settings (config.py), the run is always offline and sequential """
+    from pipeline import initialize_sqlite_db, build_stages
+    from config import PipelineConfig
+    from scheduler import run_stages
+
+    workspace = os.path.abspath(os.path.join(workspace, str(rows)))
+    mirror_dir = os.path.join(os.path.dirname(workspace), 'mirror', str(rows))
+    synthetic.write_mirror(mirror_dir, rows)
+    os.makedirs(workspace, exist_ok=True)
+
+    config = PipelineConfig.from_env(**{**settings, 'offline': True, 'mirror_dir': mirror_dir, 'workers': 1})
+    previous_dir = os.getcwd()
+    os.chdir(workspace)  # the pipeline works relative to ./data
+    try:
+        engine = initialize_sqlite_db('train_data.sqlite')
+        report = RunReport()
+        with report.step('total') as total:
+            run_stages(build_stages(engine, config, report), max_workers=config.workers)
+        engine.dispose()
+    finally:
+        os.chdir(previous_dir)
+    steps = report.close()['steps']
+    # stages only, in run order and the total last (sub-steps are named <stage>.<step>)
+    steps = [record for record in steps if '.' not in record['name'] and record is not total] + [total]
+    return {record['name']: {'seconds': record['wall_seconds'], 'peak_mb': record['peak_mb']} for record in steps}
+
+
+def compare(results, baseline, tolerance=0.25):
+    """ [(size, stage, metric, baseline value, new value)] of every stage beyond the tolerance """
+    regressions = []
+    for size, stages in results.items():
+        for stage, measured in stages.items():
+            expected = baseline.get(size, {}).get(stage)
+            if not expected:
+                continue
+            for metric, noise in (('seconds', MIN_SECONDS), ('peak_mb', MIN_PEAK_MB)):
+                if measured[metric] > expected[metric] * (1 + tolerance) and measured[metric] - expected[metric] > noise:
+                    regressions.append((size, stage, metric, expected[metric], measured[metric]))
+    return regressions
+
+
+def print_results(results, baseline):
+    for size, stages in results.items():
+        print(f"\n{size} rows")
+        for stage, measured in stages.items():
+            expected = baseline.get(size, {}).get(stage)
+            versus = f"  (baseline {expected['seconds']:.3f} s, {expected['peak_mb']:.1f} MB)" if expected else ''
+            print(f"  {stage:<26} {measured['seconds']:>9.3f} s {measured['peak_mb']:>9.1f} MB{versus}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stage-level pipeline benchmark on synthetic data")
+    parser.add_argument('--sizes', default='10k', help=f"comma separated, of {', '.join(synthetic.SIZES)} or row counts")
+    parser.add_argument('--workspace', default=DEFAULT_WORKSPACE)
+    parser.add_argument('--baseline', default=None, help=f"default: <workspace>/{BASELINE_FILE}")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown / memory growth (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    baseline_path = args.baseline or os.path.join(args.workspace, BASELINE_FILE)
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    for size in args.sizes.split(','):
+        rows = synthetic.SIZES.get(size) or int(size)
+        results[size] = run_benchmark(rows, args.workspace)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump({**baseline, **results}, baseline_file, indent=2)
+        print(f"\nBaseline saved: {baseline_path}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for size, stage, metric, expected, measured in regressions:
+        print(f"Regression: {size} {stage} {metric} {expected} -> {measured}")
+    if not baseline:
+        print(f"\nNo baseline at {baseline_path} yet, store one with --save-baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+""" Stage checkpoints, so a rerun resumes where a failed pipeline run stopped.
+
+    The dataframe of every extract / transform stage is written as an (uncompressed,
+    memory-mappable) Feather file <checkpoint_dir>/<stage>-<key>.feather. The key hashes
+    the inputs of the stage (the fingerprint of the source file, or the keys of the stages
+    before it), the source code of the modules the stage runs and the settings it depends
+    on. A rerun reads the file instead of running the stage as long as the key matches;
+    unreadable files are dropped and rebuilt.
+
+    Loads are recorded in the pipeline_checkpoints table of the database under the same
+    kind of key. The database of a run that did not finish (run.json) is kept, so the
+    resumed run skips the tables that were loaded before the failure.
+
+    """
+
+import os
+import json
+import inspect
+import hashlib
+import threading
+
+import pandas as pd
+
+DEFAULT_CHECKPOINT_DIR = './data/checkpoints'
+CHECKPOINT_TABLE = 'pipeline_checkpoints'
+RUN_FILE = 'run.json'
+
+
+def make_key(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+
+
+def code_version(*objects):
+    """ Hash of the source files of the modules defining the objects (functions or modules),
+        of the bytecode for functions without a source file """
+    sources = set()
+    for obj in objects:
+        module = obj if inspect.ismodule(obj) else inspect.getmodule(obj)
+        path = module and inspect.getsourcefile(module)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as source_file:
+                sources.add(source_file.read())
+        else:
+            sources.add(getattr(getattr(obj, '__code__', None), 'co_code', repr(obj).encode()))
+    return hashlib.sha256(b''.join(sorted(sources))).hexdigest()[:16]
+
+
+def file_fingerprint(path):
+    """ Identity of a source file (materialized cache copies keep the modification time) """
+    stat = os.stat(path)
+    return os.path.basename(path), stat.st_size, stat.st_mtime_ns
+
+
+def frame_fingerprint(df):
+    """ Identity of a dataframe: its content hash, columns and dtypes """
+    content = hashlib.sha256(pd.util.hash_pandas_object(df).to_numpy().tobytes()).hexdigest()
+    return content, list(df.columns), [str(dtype) for dtype in df.dtypes]
+
+
+class CheckpointStore:
+    """ Checkpoint files of one directory and the keys of the stages of the current run """
+
+    def __init__(self, directory=DEFAULT_CHECKPOINT_DIR):
+        self.directory = directory
+        self.keys = {}
+        self._lock = threading.Lock()
+
+    def _path(self, stage, key):
+        return os.path.join(self.directory, f'{stage}-{key}.feather')
+
+    def load(self, stage, key):
+        """ Checkpointed dataframe of a stage, None if there is no valid one """
+        from pyarrow import feather
+        path = self._path(stage, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return feather.read_table(path, memory_map=True).to_pandas()
+        except Exception as error:
+            print(f"Dropped unreadable checkpoint {path}: {error!r}")
+            os.remove(path)
+            return None
+
+    def save(self, stage, key, df):
+        """ Write the checkpoint atomically, older checkpoints of the stage are removed """
+        from pyarrow import feather
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(stage, key)
+        feather.write_feather(df, f'{path}.tmp', compression='uncompressed')
+        os.replace(f'{path}.tmp', path)
+        for file in os.listdir(self.directory):
+            if file.startswith(f'{stage}-') and file.endswith('.feather') and file != os.path.basename(path):
+                os.remove(os.path.join(self.directory, file))
+
+    def _key(self, stage, inputs, code, settings):
+        key = None if None in inputs else make_key(stage, inputs, code_version(*code), settings)
+        with self._lock:
+            self.keys[stage] = key
+        return key
+
+    def stage(self, stage, func, code=(), deps=(), settings=(), fingerprint=None):
+        """ func with a checkpoint of the dataframe it returns. Keyed by fingerprint() (root stages)
+            or the keys of deps, without a key (e.g. a provider without fingerprints) nothing is kept """
+        def run(*args):
+            if fingerprint:
+                inputs = [fingerprint()]
+            else:
+                # a root stage without a fingerprint has unknown inputs: no key
+                inputs = [self.keys.get(dep) for dep in deps] if deps else [None]
+            key = self._key(stage, inputs, code, settings)
+            if key is not None:
+                df = self.load(stage, key)
+                if df is not None:
+                    print(f"Resumed {stage} from its checkpoint: {len(df)} rows")
+                    return df
+            result = func(*args)
+            if key is not None and isinstance(result, pd.DataFrame):
+                self.save(stage, key, result)
+            return result
+        return run
+
+    def load_stage(self, stage, func, engine, table_name, code=(), deps=(), settings=()):
+        """ Load func skipped when the table was loaded with the same key before, returns the rows loaded """
+        def run(*args):
+            key = self._key(stage, [self.keys.get(dep) for dep in deps], code, settings)
+            if key is not None:
+                rows = loaded_rows(engine, stage, key, table_name)
+                if rows is not None:
+                    print(f"Resumed {stage}: {table_name} was already loaded ({rows} rows)")
+                    return rows
+            rows = func(*args)
+            if key is not None:
+                record_load(engine, stage, key, rows)
+            return rows
+        return run
+
+    def previous_run_finished(self):
+        """ False if the last run of this directory started but did not finish """
+        path = os.path.join(self.directory, RUN_FILE)
+        if not os.path.exists(path):
+            return True
+        with open(path) as run_file:
+            return json.load(run_file).get('status') == 'finished'
+
+    def mark_run(self, status):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, RUN_FILE)
+        with open(f'{path}.tmp', 'w') as run_file:
+            json.dump({'status': status}, run_file)
+        os.replace(f'{path}.tmp', path)
+
+
+def loaded_rows(engine, stage, key, table_name):
+    """ Rows of an earlier load of the table with this key, None if it has to be loaded """
+    with engine.connect() as connection:
+        tables = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if CHECKPOINT_TABLE not in tables or table_name not in tables:
+            return None
+        row = connection.exec_driver_sql(f"SELECT rows FROM {CHECKPOINT_TABLE} WHERE stage = ? AND key = ?",
+                                         (stage, key)).fetchone()
+    return row[0] if row else None
+
+
+def record_load(engine, stage, key, rows):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} "
+                                   f"(stage TEXT PRIMARY KEY, key TEXT, rows INTEGER)")
+        connection.exec_driver_sql(f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} (stage, key, rows) VALUES (?, ?, ?)",
+                                   (stage, key, rows))
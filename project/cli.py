@@ -0,0 +1,170 @@
+""" Command line entry point of the pipeline.
+
+    python project/cli.py fetch                          # download the source datasets into the cache
+    python project/cli.py load [--set streaming=1 ...]   # run the pipeline, settings of config.py
+    python project/cli.py metrics [--force]              # rebuild the metrics if a source table changed
+    python project/cli.py report [directory]             # render the figures headless
+    python project/cli.py validate                       # check the loaded database
+
+    Heavy dependencies (pandas, SQLAlchemy, matplotlib, the Kaggle API) are only imported
+    inside the subcommand that needs them. validate and an up-to-date metrics check, the
+    commands cron runs every few minutes, need nothing but sqlite3. --timing prints the
+    startup time (import of this module until the subcommand starts working) against
+    STARTUP_BUDGET_SECONDS, for information: nothing fails when it is over the budget.
+
+    """
+
+import time
+
+STARTED = time.perf_counter()  # before every other import, they count towards the startup
+
+import os
+import sys
+import argparse
+from contextlib import closing, contextmanager
+
+STARTUP_BUDGET_SECONDS = 0.25  # informational, printed by --timing
+DEFAULT_DB_PATH = './data/train_data.sqlite'
+
+
+def _settings(assignments):
+    """ Settings of the environment (PIPELINE_<NAME>, config.py) with --set name=value pairs on top """
+    from dataclasses import fields
+    from config import PipelineConfig, parse_setting
+
+    known = {field.name: field for field in fields(PipelineConfig)}
+    overrides = {}
+    for assignment in assignments:
+        name, separator, value = assignment.partition('=')
+        if not separator or name not in known:
+            raise ValueError(f"Unknown setting (name=value, see config.py): {assignment}")
+        overrides[name] = parse_setting(known[name], value)
+    return PipelineConfig.from_env(**overrides)
+
+
+@contextmanager
+def _connect(db_path):
+    """ Read-only connection: checks never write to the database """
+    import sqlite3
+    if not os.path.exists(db_path):
+        raise ValueError(f"No database at {db_path}, run the load first!")
+    with closing(sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)) as connection:
+        yield connection
+
+
+def fetch_command(args):
+    config = _settings(args.set)
+    if config.offline:
+        raise ValueError("Nothing to fetch in offline mode!")
+    import fetch
+    import pipeline
+    slugs = [pipeline.parse_dataset_slug(source['url']) for source in pipeline.SOURCES.values()]
+    fetched = fetch.fetch_datasets(slugs, pipeline.make_transport(config), retries=config.retries)
+    for slug, files in fetched.items():
+        print(f"{slug}: {', '.join(sorted(files))}")
+    return 0
+
+
+def load_command(args):
+    config = _settings(args.set)
+    import pipeline
+    pipeline.main(config)
+    return 0
+
+
+def metrics_command(args):
+    import fingerprints
+    with _connect(args.db) as connection:
+        current = fingerprints.stored_fingerprints(connection) == fingerprints.source_fingerprints(connection)
+    if current and not args.force:
+        print("Metrics are up to date.")
+        return 0
+    import sqlalchemy as sql
+    from metrics import materialize_metrics
+    materialize_metrics(sql.create_engine(f'sqlite:///{args.db}'), force=True)
+    return 0
+
+
+def report_command(args):
+    import report
+    df_cost_of_living, df_house_listings, area_data, state_data = report.read_report_tables(args.db)
+    report.render_report(df_cost_of_living, df_house_listings, args.directory, force=args.force,
+                         area_data=area_data, state_data=state_data, intervals=args.intervals)
+    return 0
+
+
+def validate_command(args):
+    """ Source tables loaded, their quality summary and metrics built from the current content """
+    import fingerprints
+    problems = []
+    with _connect(args.db) as connection:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table_name in fingerprints.SOURCE_TABLES:
+            if table_name not in tables:
+                problems.append(f"{table_name}: missing")
+                continue
+            rows = connection.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+            if not rows:
+                problems.append(f"{table_name}: no rows")
+            if 'data_quality' in tables:
+                profiled = connection.execute("SELECT value FROM data_quality WHERE table_name = ? AND "
+                                              "column_name = '*' AND metric = 'rows'", (table_name,)).fetchone()
+                if profiled is None or profiled[0] != rows:
+                    problems.append(f"{table_name}: quality summary is outdated")
+            print(f"{table_name}: {rows} rows")
+        if not problems and (fingerprints.stored_fingerprints(connection) != fingerprints.source_fingerprints(connection)):
+            problems.append("metrics are outdated (cli.py metrics)")
+    for problem in problems:
+        print(f"Invalid: {problem}")
+    if not problems:
+        print("Database is valid.")
+    return 1 if problems else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="U.S. cost of living & house prices pipeline")
+    parser.add_argument('--timing', action='store_true',
+                        help=f"print the startup time against its budget of {STARTUP_BUDGET_SECONDS}s "
+                             "(informational, never fails the command)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name, func, help_text in (('fetch', fetch_command, "download the source datasets into the cache"),
+                                  ('load', load_command, "run the pipeline")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                             help="pipeline setting (config.py), e.g. --set streaming=1")
+        command.set_defaults(func=func)
+
+    command = commands.add_parser('metrics', help="rebuild the metrics if a source table changed")
+    command.add_argument('--db', default=DEFAULT_DB_PATH)
+    command.add_argument('--force', action='store_true')
+    command.set_defaults(func=metrics_command)
+
+    command = commands.add_parser('report', help="render the figures into a directory")
+    command.add_argument('directory', nargs='?', default='./data/report')
+    command.add_argument('--db', default=DEFAULT_DB_PATH)
+    command.add_argument('--force', action='store_true', help="also render the unchanged figures")
+    command.add_argument('--intervals', action='store_true',
+                         help="add the 95%% bootstrap intervals of ECLIR, HCB and PIR (slower)")
+    command.set_defaults(func=report_command)
+
+    command = commands.add_parser('validate', help="check the loaded database")
+    command.add_argument('--db', default=DEFAULT_DB_PATH)
+    command.set_defaults(func=validate_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.timing:
+        startup = time.perf_counter() - STARTED
+        verdict = 'within' if startup <= STARTUP_BUDGET_SECONDS else 'OVER'
+        print(f"Startup: {startup:.3f}s, {verdict} the budget of {STARTUP_BUDGET_SECONDS}s", file=sys.stderr)
+    status = args.func(args)
+    if args.timing:
+        print(f"Total: {time.perf_counter() - STARTED:.3f}s", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
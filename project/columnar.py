@@ -0,0 +1,107 @@
+""" Columnar copies of the loaded tables, for the analysis side.
+
+    Next to train_data.sqlite every table can be written as a dataset partitioned by
+    state (<directory>/<table>/state=MO/part-0.arrow), either as uncompressed Arrow IPC
+    files, which are memory-mapped on read (nearly zero-copy), or as Parquet files.
+    read_columnar() reads only the requested columns (and partitions, with a filter),
+    instead of converting SELECT * results row by row. A row number column keeps the
+    load order of the rows across the partitions, the schema metadata the column order.
+
+    """
+
+import os
+import json
+import shutil
+import tempfile
+
+import pandas as pd
+
+DEFAULT_COLUMNAR_DIR = './data/columnar'
+PARTITION_COLUMN = 'state'
+EXTENSIONS = {'arrow': 'arrow', 'parquet': 'parquet'}
+ROW_NUMBER = '__row_number'
+
+
+def _file_format(file_format):
+    import pyarrow.dataset as ds
+    if file_format == 'arrow':
+        return ds.IpcFileFormat()
+    if file_format == 'parquet':
+        return ds.ParquetFileFormat()
+    raise ValueError(f"Unknown columnar format: {file_format}")
+
+
+def _to_batches(frames):
+    import pyarrow as pa
+    rows = 0
+    for df in frames:
+        # categories may differ between chunks, plain strings keep the schema stable
+        categories = df.select_dtypes('category').columns
+        df = df.astype({column: str for column in categories})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.append_column(ROW_NUMBER, pa.array(range(rows, rows + len(df)), type=pa.int64()))
+        table = table.replace_schema_metadata({b'columns': json.dumps(list(df.columns)).encode()})
+        rows += len(df)
+        yield from table.to_batches()
+
+
+def write_columnar(frames, table_name, directory=DEFAULT_COLUMNAR_DIR, file_format='arrow',
+                   partition_column=PARTITION_COLUMN):
+    """ Write a dataframe (or an iterable of dataframe chunks) as a partitioned dataset.
+        The previous copy of the table is replaced at once, readers never see half of it. """
+    import pyarrow.dataset as ds
+
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    batches = _to_batches(frames)
+    first = next(batches, None)
+    if first is None:
+        raise ValueError(f"No rows to write for {table_name}!")
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    os.makedirs(directory, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=directory, prefix=f'.{table_name}-')
+    try:
+        ds.write_dataset(all_batches(), staging_dir, schema=first.schema, format=_file_format(file_format),
+                         partitioning=[partition_column] if partition_column in first.schema.names else None,
+                         partitioning_flavor='hive', basename_template=f'part-{{i}}.{EXTENSIONS[file_format]}',
+                         existing_data_behavior='overwrite_or_ignore')
+        table_dir = os.path.join(directory, table_name)
+        if os.path.exists(table_dir):
+            shutil.rmtree(table_dir)
+        os.replace(staging_dir, table_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    print(f"{table_name} columnar copy written: {table_dir} ({file_format})")
+    return table_dir
+
+
+def table_format(table_name, directory=DEFAULT_COLUMNAR_DIR):
+    """ Format of the columnar copy of a table, None if there is none """
+    for _, _, files in os.walk(os.path.join(directory, table_name)):
+        for file in files:
+            for file_format, extension in EXTENSIONS.items():
+                if file.endswith(f'.{extension}'):
+                    return file_format
+    return None
+
+
+def read_columnar(table_name, columns=None, filter=None, directory=DEFAULT_COLUMNAR_DIR):
+    """ Memory-mapped read of the columnar copy of a table, only the given columns.
+        filter: pyarrow expression, e.g. pyarrow.dataset.field('state') == 'MO' (skips partitions) """
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    file_format = table_format(table_name, directory)
+    if file_format is None:
+        raise ValueError(f"No columnar copy of {table_name} in {directory}!")
+    dataset = ds.dataset(os.path.join(directory, table_name), format=_file_format(file_format),
+                         partitioning='hive', filesystem=fs.LocalFileSystem(use_mmap=True))
+    if columns is None:
+        columns = json.loads(dataset.schema.metadata[b'columns'])
+    table = dataset.to_table(columns=list(columns) + [ROW_NUMBER], filter=filter)
+    table = table.sort_by(ROW_NUMBER).drop_columns([ROW_NUMBER])
+    return table.to_pandas(split_blocks=True, self_destruct=True)
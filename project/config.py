@@ -0,0 +1,70 @@
+""" Pipeline settings.
+
+    Every setting can be passed to main() as a keyword argument or set through the
+    environment as PIPELINE_<NAME> (e.g. PIPELINE_OFFLINE=1, PIPELINE_WORKERS=4).
+    Keyword arguments win over the environment, the environment over the defaults.
+
+    """
+
+import os
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class PipelineConfig:
+    # dataset cache & offline mode
+    offline: bool = False                # serve datasets from the cache / mirror_dir only
+    mirror_dir: str = None               # local mirror: <mirror_dir>/<owner>/<dataset>/*.csv
+    download_url: str = None             # dataset server with <download_url>/<owner>/<dataset> archives (default Kaggle)
+    connections: int = 4                 # concurrent download connections
+    retries: int = 5                     # retries of a broken download, resumed where it stopped
+    cache_max_bytes: int = None          # cache eviction limits, applied after the run
+    cache_max_age_days: float = None
+    # streaming ingestion
+    streaming: bool = False              # read, transform and load the CSV files in chunks
+    chunk_rows: int = None               # rows per chunk ...
+    memory_limit_mb: float = None        # ... or as many rows as fit into this memory ceiling
+    # loading
+    incremental: bool = False            # keep the database, apply only the changed rows
+    bulk_load: bool = False              # full loads go through the batched bulk loader
+    journal_mode: str = 'WAL'            # SQLite pragmas used by the bulk loader
+    synchronous: str = 'NORMAL'
+    columnar: str = None                 # also write every table as 'arrow' (memory-mappable) or 'parquet' files
+    columnar_dir: str = './data/columnar'  # ... partitioned by state, <columnar_dir>/<table>/state=<state>/
+    quality: bool = True                 # profile every table while loading, fail on the thresholds of SOURCES
+    boundaries: str = None               # GeoJSON of the county boundaries: write the listing_area table
+    indexes: bool = True                 # create the managed indexes and check the hot query plans
+    metrics: bool = True                 # materialize the ECLIR / HCB / PIR tables after loading
+    # scheduling
+    workers: int = 2                     # threads running independent stages, 1 runs them one by one
+    shard_workers: int = 0               # > 1: transform each source split by state on this many processes
+    # resuming
+    checkpoints: bool = True             # checkpoint every stage, a rerun after a failure resumes from them
+    checkpoint_dir: str = './data/checkpoints'
+    # instrumentation
+    run_report: str = './data/run_report.json'  # JSON report of every step: times, memory peaks, rows
+    profile: bool = False                # also run every step under cProfile (.prof files next to the report)
+
+    @classmethod
+    def from_env(cls, **overrides):
+        values = {}
+        for field in fields(cls):
+            if overrides.get(field.name) is not None:
+                values[field.name] = overrides.pop(field.name)
+                continue
+            raw = os.environ.get(f'PIPELINE_{field.name.upper()}')
+            if raw is None or raw == '':
+                continue
+            values[field.name] = parse_setting(field, raw)
+        unknown = {name for name, value in overrides.items() if value is not None}
+        if unknown:
+            raise ValueError(f"Unknown pipeline settings: {unknown}")
+        return cls(**values)
+
+
+def parse_setting(field, raw):
+    """ Value of a setting given as text (environment, command line) """
+    field_type = type(field.default) if field.default is not None else field.type
+    if field_type is bool:
+        return raw.lower() not in ('0', 'false', 'no')
+    return field_type(raw) if isinstance(field_type, type) else raw
@@ -0,0 +1,166 @@
+""" Content-addressed local cache for the downloaded Kaggle datasets.
+
+    Files are stored once under objects/ by their SHA-256 checksum and an index.json
+    maps every dataset slug and version to the files it contains:
+
+    {"owner/dataset": {"<version>": {"files": {"name.csv": "<sha256>"}, "created": ..., "accessed": ...}}}
+
+    """
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+DEFAULT_CACHE_DIR = './data/.cache'
+INDEX_FILE = 'index.json'
+CHUNK_SIZE = 1024 * 1024
+
+# sources may be fetched concurrently, index updates are read-modify-write
+_index_lock = threading.RLock()
+
+
+def file_checksum(file_path):
+    """ SHA-256 checksum of a file, read in chunks """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_path(cache_dir, checksum):
+    return os.path.join(cache_dir, 'objects', checksum[:2], checksum)
+
+
+def _load_index(cache_dir):
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as index_file:
+        return json.load(index_file)
+
+
+def _save_index(cache_dir, index):
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as index_file:
+        json.dump(index, index_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, index_path)  # atomic swap, a crash never leaves half an index
+
+
+def _link_or_copy(source, target):
+    if os.path.exists(target):
+        if os.path.samefile(source, target):
+            return
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def store(slug, version, file_paths, cache_dir=DEFAULT_CACHE_DIR):
+    """ Add the files of one dataset version to the cache """
+    files = {}
+    for file_path in file_paths:
+        checksum = file_checksum(file_path)
+        object_path = _object_path(cache_dir, checksum)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            shutil.copy2(file_path, object_path)
+        files[os.path.basename(file_path)] = checksum
+
+    now = time.time()
+    with _index_lock:
+        index = _load_index(cache_dir)
+        index.setdefault(slug, {})[str(version)] = {'files': files, 'created': now, 'accessed': now}
+        _save_index(cache_dir, index)
+    return files
+
+
+def lookup(slug, version=None, cache_dir=DEFAULT_CACHE_DIR):
+    """ Cached files of a dataset as {file name: object path}, or None on a miss.
+        Without a version the most recently stored one is served. """
+    with _index_lock:
+        return _lookup(slug, version, cache_dir)
+
+
+def _lookup(slug, version, cache_dir):
+    index = _load_index(cache_dir)
+    versions = index.get(slug, {})
+    if version is None and versions:
+        version = max(versions, key=lambda v: versions[v]['created'])
+    entry = versions.get(str(version)) if version is not None else None
+    if entry is None:
+        return None
+
+    paths = {name: _object_path(cache_dir, checksum) for name, checksum in entry['files'].items()}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None  # objects were removed behind our back, treat as a miss
+
+    entry['accessed'] = time.time()
+    _save_index(cache_dir, index)
+    return paths
+
+
+def materialize(paths, target_dir):
+    """ Expose cached objects under their original file names in target_dir """
+    os.makedirs(target_dir, exist_ok=True)
+    materialized = {}
+    for name, object_path in paths.items():
+        target = os.path.join(target_dir, name)
+        _link_or_copy(object_path, target)
+        materialized[name] = target
+    return materialized
+
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=None, max_age_days=None):
+    """ Drop entries older than max_age_days (by last access), then the least recently
+        used ones until the cache fits into max_bytes. Returns the removed entries. """
+    with _index_lock:
+        return _evict(cache_dir, max_bytes, max_age_days)
+
+
+def _evict(cache_dir, max_bytes, max_age_days):
+    index = _load_index(cache_dir)
+    entries = [(entry['accessed'], slug, version) for slug, versions in index.items() for version, entry in versions.items()]
+    entries.sort()
+    removed = []
+
+    if max_age_days is not None:
+        cutoff = time.time() - max_age_days * 86400
+        for accessed, slug, version in list(entries):
+            if accessed < cutoff:
+                del index[slug][version]
+                entries.remove((accessed, slug, version))
+                removed.append((slug, version))
+
+    def cache_size():
+        checksums = {c for versions in index.values() for entry in versions.values() for c in entry['files'].values()}
+        return sum(os.path.getsize(_object_path(cache_dir, c)) for c in checksums if os.path.exists(_object_path(cache_dir, c)))
+
+    if max_bytes is not None:
+        while entries and cache_size() > max_bytes:
+            accessed, slug, version = entries.pop(0)
+            del index[slug][version]
+            removed.append((slug, version))
+
+    index = {slug: versions for slug, versions in index.items() if versions}
+    _save_index(cache_dir, index)
+
+    # objects no longer referenced by any entry
+    referenced = {c for versions in index.values() for entry in versions.values() for c in entry['files'].values()}
+    objects_dir = os.path.join(cache_dir, 'objects')
+    if os.path.isdir(objects_dir):
+        for prefix in os.listdir(objects_dir):
+            for checksum in os.listdir(os.path.join(objects_dir, prefix)):
+                if checksum not in referenced:
+                    os.remove(os.path.join(objects_dir, prefix, checksum))
+
+    for slug, version in removed:
+        print(f"Evicted cached dataset: {slug}@{version}")
+    return removed
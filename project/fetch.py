@@ -0,0 +1,309 @@
+""" Concurrent, resumable dataset downloads behind a pluggable transport.
+
+    A transport serves the archive (zip) of a dataset slug ('owner/dataset'):
+
+        transport.version(slug)              -> version key, the cache is keyed by it
+        transport.open(slug, offset)         -> context manager of (start, total bytes, stream)
+
+    open() resumes at offset if it can, start is where the stream actually begins (0 when
+    the server ignored the range). HTTPTransport speaks plain HTTP range requests to any
+    server with <base_url>/<owner>/<dataset> archives; KaggleTransport is the Kaggle API.
+    Both hold at most max_connections connections at once, however many datasets are
+    fetched concurrently.
+
+    Archives are downloaded into <cache_dir>/downloads/ as .part files, which survive
+    interrupted runs and are continued from their size; broken transfers are retried with
+    exponential backoff. LocalDatasetServer is a local stand-in host for tests, serving a
+    mirror directory (<mirror_dir>/<owner>/<dataset>/*.csv) as archives, or redirecting
+    to another host like the Kaggle download endpoint.
+
+    """
+
+import io
+import os
+import time
+import base64
+import random
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import threading
+import http.client
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+import dataset_cache
+
+KAGGLE_DOWNLOAD_URL = 'https://www.kaggle.com/api/v1/datasets/download'
+CHUNK_SIZE = 1024 * 1024
+RETRIES = 5
+BACKOFF_SECONDS = 0.5
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class HTTPTransport:
+    """ Dataset archives at <base_url>/<owner>/<dataset>, fetched with HTTP range requests """
+
+    def __init__(self, base_url, username=None, key=None, token=None, max_connections=4, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.authorization = authorization(username, key, token)
+        self.timeout = timeout
+        self._connections = threading.BoundedSemaphore(max_connections)
+
+    def _request(self, slug, method='GET', headers=None):
+        request = Request(f'{self.base_url}/{slug}', method=method, headers=headers or {})
+        if self.authorization:
+            # Kaggle redirects downloads to signed storage URLs, the credentials must not follow
+            request.add_unredirected_header('Authorization', self.authorization)
+        return urlopen(request, timeout=self.timeout)
+
+    def version(self, slug):
+        """ Version key from the ETag (or the modification time and size) of the archive """
+        with self._connections, self._request(slug, 'HEAD') as response:
+            headers = response.headers
+            tag = headers.get('ETag') or f"{headers.get('Last-Modified')}:{headers.get('Content-Length')}"
+        return hashlib.sha256(tag.encode()).hexdigest()[:16]
+
+    @contextmanager
+    def open(self, slug, offset=0):
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with self._connections, self._request(slug, headers=headers) as response:
+            start = offset if response.status == 206 else 0
+            length = response.headers.get('Content-Length')
+            yield start, start + int(length) if length is not None else None, response
+
+
+def authorization(username=None, key=None, token=None):
+    """ Authorization header: Bearer for an access token, Basic for a username and API key """
+    if token:
+        return f'Bearer {token}'
+    if username and key:
+        return 'Basic ' + base64.b64encode(f'{username}:{key}'.encode()).decode()
+    return None
+
+
+class KaggleTransport(HTTPTransport):
+    """ The Kaggle API: versions from the dataset file listing, archives over HTTP with the
+        credentials the API authenticated with on first use: an access token (KAGGLE_API_TOKEN,
+        ~/.kaggle/access_token, OAuth) or the legacy username and key of ~/.kaggle/kaggle.json """
+
+    def __init__(self, max_connections=4, timeout=60):
+        super().__init__(KAGGLE_DOWNLOAD_URL, max_connections=max_connections, timeout=timeout)
+        self._api = None
+        self._lock = threading.Lock()
+
+    def api(self):
+        with self._lock:
+            if self._api is None:
+                from kaggle.api.kaggle_api_extended import KaggleApi  # authenticates on import
+                api = KaggleApi()
+                api.authenticate()
+                config = api.config_values
+                self.authorization = authorization(config.get('username'), config.get('key'), config.get('token'))
+                self._api = api
+        return self._api
+
+    def version(self, slug):
+        return remote_dataset_version(self.api(), slug)
+
+    def open(self, slug, offset=0):
+        self.api()
+        return super().open(slug, offset)
+
+
+def remote_dataset_version(api, slug):
+    """ Version key of a dataset: fingerprint of its remote file listing """
+    listing = api.dataset_list_files(slug)
+    files = getattr(listing, 'files', None) or getattr(listing, 'dataset_files', None) or []
+    fingerprint = sorted(
+        (str(getattr(f, 'name', f)),
+         str(getattr(f, 'total_bytes', getattr(f, 'totalBytes', ''))),
+         str(getattr(f, 'creation_date', getattr(f, 'creationDate', ''))))
+        for f in files)
+    return hashlib.sha256(repr(fingerprint).encode()).hexdigest()[:16]
+
+
+def _retryable(error):
+    if isinstance(error, HTTPError):
+        return error.code in RETRY_STATUS
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def download_archive(transport, slug, archive_path, retries=RETRIES, backoff=BACKOFF_SECONDS):
+    """ Download the archive of a dataset into archive_path, continuing a .part file left
+        by an earlier attempt (or run). Transfer errors are retried with exponential backoff. """
+    part_path = f'{archive_path}.part'
+    os.makedirs(os.path.dirname(archive_path) or '.', exist_ok=True)
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        try:
+            with transport.open(slug, offset) as (start, total, stream), \
+                    open(part_path, 'r+b' if start else 'wb') as part:
+                part.seek(start)
+                part.truncate()
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    part.write(chunk)
+            size = os.path.getsize(part_path)
+            if total is not None and size < total:
+                raise ConnectionError(f"transfer ended at {size} of {total} bytes")
+            os.replace(part_path, archive_path)
+            return archive_path
+        except HTTPError as error:
+            if error.code == 416 and offset:
+                os.remove(part_path)  # the part does not fit the archive (anymore), start over
+                continue
+            if not _retryable(error) or attempt == retries:
+                raise
+            failure = error
+        except Exception as error:
+            if not _retryable(error) or attempt == retries:
+                raise
+            failure = error
+        delay = backoff * 2 ** attempt * (1 + random.random())
+        print(f"Download of {slug} failed ({failure!r}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+    raise ValueError(f"Download of {slug} failed after {retries} retries!")
+
+
+def fetch_dataset(slug, transport, cache_dir=dataset_cache.DEFAULT_CACHE_DIR, retries=RETRIES,
+                  backoff=BACKOFF_SECONDS):
+    """ Cached files of the current version of a dataset, {file: path}; downloaded on a miss """
+    version = transport.version(slug)
+    cached = dataset_cache.lookup(slug, version, cache_dir)
+    if cached:
+        print(f"Cache hit: {slug}@{version}")
+        return cached
+
+    archive_path = os.path.join(cache_dir, 'downloads', *slug.split('/')) + f'-{version}.zip'
+    download_archive(transport, slug, archive_path, retries, backoff)
+    staging_dir = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            downloaded = []
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                target = os.path.join(staging_dir, os.path.basename(member.filename))
+                with archive.open(member) as source, open(target, 'wb') as file:
+                    shutil.copyfileobj(source, file, CHUNK_SIZE)
+                downloaded.append(target)
+        dataset_cache.store(slug, version, downloaded, cache_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    os.remove(archive_path)
+    print(f"Downloaded {slug}@{version}")
+    return dataset_cache.lookup(slug, version, cache_dir)
+
+
+def fetch_datasets(slugs, transport, cache_dir=dataset_cache.DEFAULT_CACHE_DIR, retries=RETRIES,
+                   backoff=BACKOFF_SECONDS):
+    """ Fetch several datasets concurrently (the transport limits the connections),
+        returns {slug: {file: path}} """
+    slugs = list(dict.fromkeys(slugs))
+    if not slugs:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(slugs)) as executor:
+        files = executor.map(lambda slug: fetch_dataset(slug, transport, cache_dir, retries, backoff), slugs)
+        return dict(zip(slugs, files))
+
+
+class LocalDatasetServer:
+    """ Stand-in dataset host serving <mirror_dir>/<owner>/<dataset>/*.csv as zip archives
+        at <url>/<owner>/<dataset>, with range requests. fail_after: the first response of
+        every archive breaks off after this many bytes, as on a flaky link. redirect_to: only
+        redirect every request to <redirect_to>/<owner>/<dataset>, as Kaggle does to storage.
+
+        with LocalDatasetServer('tests/mirror') as server:
+            fetch_datasets(['owner/dataset'], HTTPTransport(server.url))
+    """
+
+    def __init__(self, mirror_dir, fail_after=None, redirect_to=None):
+        self.mirror_dir = mirror_dir
+        self.fail_after = fail_after
+        self.redirect_to = redirect_to
+        self.requests = []  # (slug, offset) of every GET
+        self.authorizations = []  # Authorization header of every request, None without
+        self._archives = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def archive(self, slug):
+        """ Zip archive of a mirrored dataset, None if it is not mirrored """
+        with self._lock:
+            if slug not in self._archives:
+                dataset_dir = os.path.join(self.mirror_dir, *slug.split('/'))
+                if not os.path.isdir(dataset_dir):
+                    return None
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                    for file in sorted(os.listdir(dataset_dir)):
+                        if file.endswith('.csv'):
+                            archive.write(os.path.join(dataset_dir, file), file)
+                self._archives[slug] = buffer.getvalue()
+            return self._archives[slug]
+
+    def __enter__(self):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.respond(body=False)
+
+            def do_GET(self):
+                self.respond(body=True)
+
+            def respond(self, body):
+                slug = self.path.strip('/')
+                with server._lock:
+                    server.authorizations.append(self.headers['Authorization'])
+                if server.redirect_to:
+                    self.send_response(302)
+                    self.send_header('Location', f'{server.redirect_to}/{slug}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                data = server.archive(slug)
+                if data is None:
+                    self.send_error(404)
+                    return
+                offset = int(self.headers['Range'][len('bytes='):].split('-')[0]) if self.headers['Range'] else 0
+                if offset >= len(data) and offset:
+                    self.send_error(416)
+                    return
+                self.send_response(206 if offset else 200)
+                self.send_header('Content-Length', str(len(data) - offset))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('ETag', f'"{hashlib.sha256(data).hexdigest()[:16]}"')
+                if offset:
+                    self.send_header('Content-Range', f'bytes {offset}-{len(data) - 1}/{len(data)}')
+                self.end_headers()
+                if not body:
+                    return
+                with server._lock:
+                    first = all(requested != slug for requested, _ in server.requests)
+                    server.requests.append((slug, offset))
+                if first and server.fail_after is not None:
+                    self.wfile.write(data[offset:offset + server.fail_after])
+                    self.close_connection = True  # connection drops mid-transfer
+                    return
+                self.wfile.write(data[offset:])
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
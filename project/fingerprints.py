@@ -0,0 +1,51 @@
+""" Content fingerprints of the source tables, to tell whether the materialized metrics
+    (metrics.py) are still current. Plain SQL on any connection, SQLAlchemy or sqlite3,
+    so checking freshness needs no pandas (cli.py metrics runs from cron).
+
+    The fingerprint of a table adds up a hash of every row (modulo 2**64), so it does not
+    depend on the row order but changes with any edit of a value, e.g. a row moved to
+    another state.
+
+    """
+
+import hashlib
+
+SOURCE_TABLES = ['cost_of_living', 'house_listings']
+FINGERPRINT_TABLE = 'metrics_sources'
+
+
+def _execute(connection, statement, parameters=()):
+    execute = getattr(connection, 'exec_driver_sql', None) or connection.execute
+    return execute(statement, parameters)
+
+
+def table_fingerprint(connection, table_name):
+    """ Columns, row count and order-independent sum of the row hashes of a table: one scan """
+    columns = [row[1] for row in _execute(connection, f"PRAGMA table_info({table_name})")]
+    rows, total = 0, 0
+    for row in _execute(connection, f"SELECT * FROM {table_name}"):
+        digest = hashlib.blake2b(repr(tuple(row)).encode(), digest_size=8).digest()
+        total = (total + int.from_bytes(digest, 'little')) % 2 ** 64
+        rows += 1
+    return repr((columns, rows, total))
+
+
+def source_fingerprints(connection):
+    return {table_name: table_fingerprint(connection, table_name) for table_name in SOURCE_TABLES}
+
+
+def stored_fingerprints(connection):
+    """ Fingerprints the metrics were last built from, {} if they never were (nothing is written) """
+    exists = _execute(connection, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                      (FINGERPRINT_TABLE,)).fetchone()
+    if not exists:
+        return {}
+    return dict(_execute(connection, f"SELECT table_name, fingerprint FROM {FINGERPRINT_TABLE}").fetchall())
+
+
+def store_fingerprints(connection, fingerprints):
+    _execute(connection, f"CREATE TABLE IF NOT EXISTS {FINGERPRINT_TABLE} (table_name TEXT PRIMARY KEY, fingerprint TEXT)")
+    _execute(connection, f"DELETE FROM {FINGERPRINT_TABLE}")
+    for table_name, fingerprint in fingerprints.items():
+        _execute(connection, f"INSERT INTO {FINGERPRINT_TABLE} (table_name, fingerprint) VALUES (?, ?)",
+                 (table_name, fingerprint))
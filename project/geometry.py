@@ -0,0 +1,169 @@
+""" Local store of the U.S. state shapes used by the choropleth map.
+
+    The full-resolution GeoJSON is downloaded once into the cache directory (or taken
+    from $PIPELINE_GEOJSON). From it, pre-simplified and precision-reduced copies are
+    built for several zoom levels and cached next to it, so map rendering needs no
+    network access and hands plotly far fewer vertices. The fingerprint of the source
+    is stored with the levels, they are rebuilt when the source changes. Offline, the
+    shapes must be in the cache directory (or $PIPELINE_GEOJSON) already.
+
+    """
+
+import os
+import json
+from urllib.request import urlopen
+
+import numpy as np
+
+SOURCE_URL = 'https://raw.githubusercontent.com/PublicaMundi/MappingAPI/master/data/geojson/us-states.json'
+DEFAULT_GEO_DIR = './data/.cache/geo'
+FINGERPRINT_FILE = 'us-states-source.json'  # fingerprint of the source the levels were built from
+
+# zoom level -> (Douglas-Peucker tolerance in degrees, decimals kept)
+ZOOM_LEVELS = {
+    'low': (0.05, 2),     # national overview
+    'medium': (0.01, 3),
+    'high': (0.002, 4),   # single states
+}
+
+
+def simplify_ring(points, tolerance):
+    """ Douglas-Peucker simplification of a closed ring (iterative, vectorized per segment) """
+    points = np.asarray(points, dtype='float64')
+    if len(points) <= 4:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack += [(start, split), (split, end)]
+    return points[keep]
+
+
+def simplify_polygon(rings, tolerance, decimals):
+    """ Simplified polygon, or None if its outer ring collapses (small islands) """
+    simplified = []
+    for ring_number, ring in enumerate(rings):
+        ring = np.round(simplify_ring(ring, tolerance), decimals)
+        if len(ring) < 4:
+            if ring_number == 0:
+                return None
+            continue  # drop collapsed holes
+        simplified.append(ring.tolist())
+    return simplified
+
+
+def simplify_geometry(geometry, tolerance, decimals):
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    else:
+        polygons = geometry['coordinates']
+    simplified = [p for p in (simplify_polygon(rings, tolerance, decimals) for rings in polygons) if p]
+    if not simplified:
+        # everything collapsed: keep the largest polygon, only precision-reduced
+        largest = max(polygons, key=lambda rings: len(rings[0]))
+        simplified = [[np.round(np.asarray(ring), decimals).tolist() for ring in largest]]
+    if len(simplified) == 1:
+        return {'type': 'Polygon', 'coordinates': simplified[0]}
+    return {'type': 'MultiPolygon', 'coordinates': simplified}
+
+
+def _source_path(geo_dir):
+    return os.environ.get('PIPELINE_GEOJSON') or os.path.join(geo_dir, 'us-states.json')
+
+
+def source_fingerprint(source_path):
+    stat = os.stat(source_path)
+    return [os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns]
+
+
+def _source_geojson(geo_dir, offline):
+    source_path = _source_path(geo_dir)
+    if not os.path.exists(source_path):
+        if offline:
+            raise ValueError(f"Offline mode: no state shapes at {source_path}!")
+        os.makedirs(os.path.dirname(source_path) or '.', exist_ok=True)
+        with urlopen(SOURCE_URL) as response:
+            states = json.load(response)
+        with open(source_path, 'w') as source_file:
+            json.dump(states, source_file)
+        print(f"Downloaded state shapes into: {source_path}")
+    with open(source_path) as source_file:
+        return source_path, json.load(source_file)
+
+
+def simplify_states(states, level):
+    """ Simplified FeatureCollection of one zoom level, features keyed by state_long_name """
+    tolerance, decimals = ZOOM_LEVELS[level]
+    features = [{
+        'type': 'Feature',
+        'id': feature['properties']['name'],
+        'properties': {'name': feature['properties']['name']},
+        'geometry': simplify_geometry(feature['geometry'], tolerance, decimals),
+    } for feature in states['features']]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _write_json(path, data):
+    with open(path, 'w') as json_file:
+        json.dump(data, json_file, separators=(',', ':'))
+
+
+def build_zoom_levels(geo_dir=DEFAULT_GEO_DIR, offline=False):
+    """ Write the simplified FeatureCollection of every zoom level and the source fingerprint """
+    os.makedirs(geo_dir, exist_ok=True)
+    source_path, states = _source_geojson(geo_dir, offline)
+    for level in ZOOM_LEVELS:
+        _write_json(os.path.join(geo_dir, f'us-states-{level}.json'), simplify_states(states, level))
+    _write_json(os.path.join(geo_dir, FINGERPRINT_FILE), source_fingerprint(source_path))
+    print(f"Built simplified state shapes: {', '.join(ZOOM_LEVELS)}")
+
+
+def _levels_current(geo_dir, level_path, source_path):
+    """ Built level of the current source (any built level if there is no source anymore) """
+    if not os.path.exists(level_path):
+        return False
+    if not os.path.exists(source_path):
+        return True
+    fingerprint_path = os.path.join(geo_dir, FINGERPRINT_FILE)
+    if not os.path.exists(fingerprint_path):
+        return False
+    with open(fingerprint_path) as fingerprint_file:
+        return json.load(fingerprint_file) == source_fingerprint(source_path)
+
+
+def load_states_geojson(level='low', geo_dir=DEFAULT_GEO_DIR, offline=None):
+    """ Simplified state shapes for a zoom level, built on first use and when the source changes.
+        offline (default: $PIPELINE_OFFLINE): never download the source shapes """
+    if offline is None:
+        offline = os.environ.get('PIPELINE_OFFLINE', '').lower() not in ('', '0', 'false', 'no')
+    if level not in ZOOM_LEVELS:
+        raise ValueError(f"Unknown zoom level: {level}")
+    level_path = os.path.join(geo_dir, f'us-states-{level}.json')
+    source_path = _source_path(geo_dir)
+    if not _levels_current(geo_dir, level_path, source_path):
+        build_zoom_levels(geo_dir, offline)
+    with open(level_path) as level_file:
+        return json.load(level_file)
+
+
+def state_geometry(state_long_name, level='low', geo_dir=DEFAULT_GEO_DIR, offline=None):
+    """ Geometry of one state, e.g. state_geometry('Missouri') """
+    for feature in load_states_geojson(level, geo_dir, offline)['features']:
+        if feature['id'] == state_long_name:
+            return feature['geometry']
+    raise ValueError(f"Unknown state: {state_long_name}")
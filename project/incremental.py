@@ -0,0 +1,96 @@
+""" Incremental loading: apply only the rows that were added, changed or removed.
+
+    For every loaded table the row_state table remembers the key, content hash and
+    rowid of each row. A refresh compares the new dataframe against it and touches
+    only the differing rows, all in one transaction.
+
+    """
+
+import pandas as pd
+import sqlalchemy as sql
+
+STATE_TABLE = 'row_state'
+
+
+def row_hashes(df):
+    """ Stable content hash per row (independent of the dataframe index) """
+    return pd.util.hash_pandas_object(df, index=False).astype('int64').reset_index(drop=True)
+
+
+def row_keys(df, hashes, key_column=None):
+    """ Key of every row: key_column (a column or a list of columns) if the table has one,
+        otherwise the row hash plus its occurrence number, so identical rows stay distinguishable """
+    if key_column is None:
+        return hashes.astype(str) + '#' + hashes.groupby(hashes).cumcount().astype(str)
+    columns = [key_column] if isinstance(key_column, str) else list(key_column)
+    keys = df[columns[0]].astype(str).reset_index(drop=True)
+    for column in columns[1:]:
+        keys = keys + '|' + df[column].astype(str).reset_index(drop=True)
+    duplicated = keys.duplicated()
+    if duplicated.any():
+        raise ValueError(f"{duplicated.sum()} rows repeat the key ({', '.join(columns)}) of another row, "
+                         f"e.g. {keys[duplicated].iloc[0]}: incremental loads need a unique key!")
+    return keys
+
+
+def _insert_rows(connection, table_name, df, row_ids):
+    columns = ', '.join(df.columns)
+    placeholders = ', '.join(['?'] * (len(df.columns) + 1))
+    values = df.astype(object).where(df.notna(), None)
+    rows = [(int(row_id), *row) for row_id, row in zip(row_ids, values.itertuples(index=False))]
+    connection.exec_driver_sql(f"INSERT INTO {table_name} (rowid, {columns}) VALUES ({placeholders})", rows)
+
+
+def _save_state(connection, table_name, keys, hashes, row_ids):
+    rows = [(table_name, key, int(row_hash), int(row_id)) for key, row_hash, row_id in zip(keys, hashes, row_ids)]
+    connection.exec_driver_sql(
+        f"INSERT INTO {STATE_TABLE} (table_name, row_key, row_hash, row_id) VALUES (?, ?, ?, ?)", rows)
+
+
+def load_incremental(df, table_name, engine, key_column=None):
+    """ Bring table_name in line with df. The first load (no table or no state yet) writes
+        the whole frame, later loads only the delta. Returns (added, changed, removed). """
+    df = df.reset_index(drop=True)
+    hashes = row_hashes(df)
+    keys = row_keys(df, hashes, key_column)
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+            "(table_name TEXT, row_key TEXT, row_hash BIGINT, row_id BIGINT, PRIMARY KEY (table_name, row_key))")
+        old_state = pd.DataFrame(
+            connection.exec_driver_sql(
+                f"SELECT row_key, row_hash, row_id FROM {STATE_TABLE} WHERE table_name = ?", (table_name,)).fetchall(),
+            columns=['row_key', 'row_hash', 'row_id'])
+
+        if not sql.inspect(connection).has_table(table_name) or old_state.empty:
+            """ Full load """
+            connection.exec_driver_sql(f"DELETE FROM {STATE_TABLE} WHERE table_name = ?", (table_name,))
+            df.to_sql(table_name, connection, if_exists='replace', index=False)
+            _save_state(connection, table_name, keys, hashes, range(1, len(df) + 1))
+            return len(df), 0, 0
+
+        new_state = pd.DataFrame({'row_key': keys, 'new_hash': hashes})
+        delta = new_state.merge(old_state, on='row_key', how='outer', indicator=True)
+        added = delta['_merge'] == 'left_only'
+        removed = delta['_merge'] == 'right_only'
+        changed = (delta['_merge'] == 'both') & (delta['new_hash'] != delta['row_hash'])
+
+        """ Delete removed and outdated rows """
+        outdated = delta.loc[removed | changed]
+        if len(outdated):
+            connection.exec_driver_sql(
+                f"DELETE FROM {table_name} WHERE rowid = ?", [(int(row_id),) for row_id in outdated['row_id']])
+            connection.exec_driver_sql(
+                f"DELETE FROM {STATE_TABLE} WHERE table_name = ? AND row_key = ?",
+                [(table_name, key) for key in outdated['row_key']])
+
+        """ Insert new and updated rows """
+        to_insert = new_state.index[new_state['row_key'].isin(delta.loc[added | changed, 'row_key'])]
+        if len(to_insert):
+            next_row_id = connection.exec_driver_sql(f"SELECT COALESCE(MAX(rowid), 0) FROM {table_name}").scalar() + 1
+            row_ids = range(next_row_id, next_row_id + len(to_insert))
+            _insert_rows(connection, table_name, df.loc[to_insert], row_ids)
+            _save_state(connection, table_name, keys[to_insert], hashes[to_insert], row_ids)
+
+    return int(added.sum()), int(changed.sum()), int(removed.sum())
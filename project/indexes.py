@@ -0,0 +1,63 @@
+""" Managed indexes of the loaded tables and query-plan checks for the hot queries.
+
+    The indexes are created once the bulk load is done (building them while inserting
+    is much slower). check_query_plans() runs EXPLAIN QUERY PLAN for every registered
+    hot query and fails if one of them falls back to a full table scan.
+
+    """
+
+# (index name, table, columns): the state/area groupings of data-analysis.py and the
+# metrics, the MO imputation and household lookups
+MANAGED_INDEXES = [
+    ('ix_cost_of_living_household_id', 'cost_of_living', ['household_id']),
+    ('ix_cost_of_living_state_area', 'cost_of_living', ['state', 'areaname', 'median_family_income']),
+    ('ix_cost_of_living_state_total', 'cost_of_living', ['state', 'total_household_expenses']),
+    ('ix_house_listings_state_price', 'house_listings', ['state', 'property_price']),
+]
+
+# name -> query (with literal parameters, EXPLAIN needs no bindings)
+HOT_QUERIES = {
+    'household by id': "SELECT * FROM cost_of_living WHERE household_id = 1",
+    'households without id': "SELECT COUNT(*) FROM cost_of_living WHERE household_id IS NULL",
+    'areas of a state': "SELECT * FROM cost_of_living WHERE state = 'MO' AND areaname = 'x'",
+    'income per area': "SELECT state, areaname, AVG(median_family_income) FROM cost_of_living GROUP BY state, areaname",
+    'areas per state': "SELECT state, COUNT(DISTINCT areaname) FROM cost_of_living GROUP BY state",
+    'MO total expenses': "SELECT state, total_household_expenses FROM cost_of_living WHERE state = 'MO'",
+    'prices of a state': "SELECT property_price FROM house_listings WHERE state = 'MO'",
+    'prices per state': "SELECT state, property_price FROM house_listings ORDER BY state, property_price",
+}
+
+
+def create_indexes(engine, indexes=MANAGED_INDEXES):
+    """ Create the managed indexes of every existing table, then refresh the planner statistics """
+    with engine.begin() as connection:
+        tables = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        created = 0
+        for index_name, table_name, columns in indexes:
+            if table_name in tables:
+                connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})")
+                created += 1
+        connection.exec_driver_sql("ANALYZE")
+    print(f"Managed indexes are in place: {created}")
+
+
+def full_scans(engine, queries=HOT_QUERIES):
+    """ {query name: plan line} of every hot query that scans a whole table """
+    regressions = {}
+    with engine.connect() as connection:
+        for name, query in queries.items():
+            for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}"):
+                detail = row[-1]
+                # 'SCAN t USING (COVERING) INDEX ...' reads an index, plain 'SCAN t' reads the table
+                if detail.startswith('SCAN ') and ' USING ' not in detail:
+                    regressions[name] = detail
+    return regressions
+
+
+def check_query_plans(engine, queries=HOT_QUERIES):
+    """ Fail loudly if a hot query regressed to a full table scan """
+    regressions = full_scans(engine, queries)
+    if regressions:
+        details = '; '.join(f"{name}: {detail}" for name, detail in regressions.items())
+        raise ValueError(f"Hot queries fall back to full table scans: {details}")
+    print(f"Query plans checked: {len(queries)} hot queries use indexes")
@@ -0,0 +1,163 @@
+""" Instrumentation of the pipeline steps, written out as a JSON run report.
+
+    Every stage (and the transform / clean steps inside a transform stage) records
+    its wall time, CPU time, peak memory growth and the rows it received and
+    returned, e.g. how many listings the price and area filters dropped.
+
+    Memory is the resident set size sampled by a background thread, so it costs
+    nothing on the measured code; while stages run concurrently their peaks overlap.
+    CPU time is the time of the thread running the step (sharded transforms spend
+    theirs in worker processes).
+
+    Profiler hooks: with profile=True every step is also run under cProfile and its
+    stats are dumped next to the report (<report>.<step>.prof); hooks added with
+    add_hook() are called as hook(step record) once a step finished.
+
+    """
+
+import os
+import json
+import time
+import resource
+import threading
+import itertools
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+SAMPLE_SECONDS = 0.005
+
+
+def rss_mb():
+    """ Current resident set size (Linux), otherwise the peak so far """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+class MemorySampler:
+    """ Highest RSS seen within each open window, sampled by a daemon thread """
+
+    def __init__(self):
+        self._windows = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            current = rss_mb()
+            with self._lock:
+                for window in self._windows.values():
+                    window[1] = max(window[1], current)
+
+    def open(self):
+        """ Start a window, returns its id """
+        current = rss_mb()
+        with self._lock:
+            window_id = next(self._ids)
+            self._windows[window_id] = [current, current]
+        return window_id
+
+    def close(self, window_id):
+        """ Peak growth (MB) over the start of the window """
+        current = rss_mb()
+        with self._lock:
+            start, peak = self._windows.pop(window_id)
+        return max(peak, current) - start
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def count_rows(value):
+    """ Rows of a dataframe (or anything with a shape) or a returned row count, None for everything else """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+class RunReport:
+    """ Step records of one pipeline run """
+
+    def __init__(self, path=None, profile=False, settings=None):
+        self.path = path
+        self.profile = profile
+        self.settings = settings or {}
+        self.steps = []
+        self.hooks = []
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._sampler = MemorySampler()
+
+    def add_hook(self, hook):
+        """ hook(record) is called after every step, e.g. to ship the records to monitoring """
+        self.hooks.append(hook)
+
+    @contextmanager
+    def step(self, name, rows_in=None):
+        """ Measure the block as one step; set record['rows_out'] inside it """
+        record = {'name': name, 'rows_in': rows_in, 'rows_out': None,
+                  'offset_seconds': round(time.perf_counter() - self._start, 4)}
+        profiler = None
+        if self.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+        window_id = self._sampler.open()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+            record['status'] = 'ok'
+        except BaseException as error:
+            record['status'] = 'failed'
+            record['error'] = repr(error)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            record['wall_seconds'] = round(time.perf_counter() - wall, 4)
+            record['cpu_seconds'] = round(time.thread_time() - cpu, 4)
+            record['peak_mb'] = round(self._sampler.close(window_id), 2)
+            if profiler and self.path:
+                profiler.dump_stats(f'{os.path.splitext(self.path)[0]}.{name}.prof')
+            with self._lock:
+                self.steps.append(record)
+            for hook in self.hooks:
+                hook(record)
+
+    def instrument(self, name, func):
+        """ func wrapped into a step, rows counted from its dataframe arguments and result """
+        def run(*args):
+            counts = [rows for rows in map(count_rows, args) if rows is not None]
+            with self.step(name, sum(counts) if counts else None) as record:
+                result = func(*args)
+                record['rows_out'] = count_rows(result)
+            return result
+        return run
+
+    def to_dict(self):
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self._start, 4),
+            'settings': self.settings,
+            'steps': sorted(self.steps, key=lambda record: record['offset_seconds']),
+        }
+
+    def close(self):
+        """ Stop sampling and write the report (if it has a path), returns it as a dict """
+        self._sampler.stop()
+        report = self.to_dict()
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'w') as report_file:
+                json.dump(report, report_file, indent=2, default=str)
+            print(f"Run report written: {self.path}")
+        return report
@@ -0,0 +1,113 @@
+""" Affordability metrics, materialized in the database at load time.
+
+    ECLIR: Essential Cost of Living to Income Ratio
+    HCB:   Housing Cost Burden
+    PIR:   Price to Income Ratio
+
+    Everything is derived from one area-level aggregate cube (area_cube), built in a
+    single groupby pass; data-analysis.py uses the same functions. Area-level metrics
+    go to the area_metrics table, state-level ones to state_metrics. They are only
+    recomputed when the fingerprint of a source table changed since the last refresh,
+    and the reports (report.py) read them instead of the source tables while they are current.
+
+    """
+
+import pandas as pd
+
+from fingerprints import source_fingerprints, stored_fingerprints, store_fingerprints
+
+areas = ['state', 'areaname']
+
+essential_expenses = ['housing_expenses', 'food_expenses', 'transport_expenses',
+                      'healthcare_expenses', 'other_necessities_expenses', 'childcare_expenses']
+expense_columns = essential_expenses + ['household_taxes']
+weight_columns = ['total_household_expenses', 'total_housing_expenses']
+
+# PIR categories
+pir_bins = [0, 3, 4, 5, float('inf')]
+pir_categories = ['Low (0-3)', 'Moderate (3-4)', 'Serious (4-5)', 'Severe (>5)']
+
+
+def area_cube(df_cost_of_living):
+    """ Area-level aggregate cube in one vectorized groupby: median and sum of every expense
+        column, total (housing) expenses and the mean income of each (state, areaname) """
+    df = df_cost_of_living.assign(
+        total_housing_expenses=df_cost_of_living['housing_expenses'] + df_cost_of_living['household_taxes'])
+
+    aggregations = {f'median_{column}': (column, 'median') for column in expense_columns}
+    aggregations.update({f'sum_{column}': (column, 'sum') for column in expense_columns + weight_columns})
+    # mean() is the best choice because median family income values are very similar within an area
+    aggregations['median_income_area'] = ('median_family_income', 'mean')
+
+    return df.groupby(areas, observed=True, sort=True).agg(**aggregations).reset_index()
+
+
+def weighted_mean(values, weights, groups):
+    """ Weighted mean of values per group, without a Python call per group """
+    weighted_sum = (values * weights).groupby(groups, observed=True).sum()
+    return weighted_sum / weights.groupby(groups, observed=True).sum()
+
+
+def area_metrics(cube):
+    """ ECLIR and HCB per area, with the weights used to aggregate them per state """
+    area_data = cube[areas + ['median_income_area']].copy()
+
+    # ECLIR per area
+    area_data['median_essential_expenses'] = cube[[f'median_{column}' for column in essential_expenses]].sum(axis=1)
+    area_data['eclir_area'] = area_data['median_essential_expenses'] / area_data['median_income_area'] * 100
+
+    # HCB per area
+    area_data['total_median_housing_expenses'] = cube['median_housing_expenses'] + cube['median_household_taxes']
+    area_data['hcb_area'] = area_data['total_median_housing_expenses'] / area_data['median_income_area'] * 100
+
+    # weights: total expenses / total housing expenses of the area
+    area_data['total_area_expenses'] = cube['sum_total_household_expenses']
+    area_data['total_area_housing_expenses'] = cube['sum_total_housing_expenses']
+
+    # expense totals of the area, the reports sum them per state
+    for column in expense_columns:
+        area_data[f'sum_{column}'] = cube[f'sum_{column}']
+    return area_data
+
+
+def state_metrics(area_data, df_house_listings):
+    """ ECLIR and HCB weighted per state, PIR from the state medians of income and house price """
+    states = area_data['state']
+    state_data = pd.DataFrame({
+        'state_eclir': weighted_mean(area_data['eclir_area'], area_data['total_area_expenses'], states),
+        'state_hcb': weighted_mean(area_data['hcb_area'], area_data['total_area_housing_expenses'], states),
+        # median of the area medians
+        'median_income_state': area_data.groupby('state', observed=True)['median_income_area'].median(),
+    })
+    state_data.index = state_data.index.astype(str)
+
+    house_price = df_house_listings.groupby('state', observed=True)['property_price'].median()
+    house_price.index = house_price.index.astype(str)
+    state_data['median_house_price_state'] = house_price
+    state_data['price_to_income_ratio'] = state_data['median_house_price_state'] / state_data['median_income_state']
+    state_data['price_to_income_category'] = pd.cut(state_data['price_to_income_ratio'],
+                                                    bins=pir_bins, labels=pir_categories).astype(object)
+    return state_data.rename_axis('state').reset_index()
+
+
+def materialize_metrics(engine, force=False):
+    """ (Re)build area_metrics and state_metrics if a source table changed. Returns True on refresh. """
+    with engine.begin() as connection:
+        fingerprints = source_fingerprints(connection)
+        if not force and stored_fingerprints(connection) == fingerprints:
+            print("Metrics are up to date.")
+            return False
+
+        df_cost_of_living = pd.read_sql_query(
+            f"SELECT state, areaname, median_family_income, household_taxes, total_household_expenses, "
+            f"{', '.join(essential_expenses)} FROM cost_of_living", connection)
+        df_house_listings = pd.read_sql_query("SELECT state, property_price FROM house_listings", connection)
+
+        area_data = area_metrics(area_cube(df_cost_of_living))
+        state_data = state_metrics(area_data, df_house_listings)
+        area_data.to_sql('area_metrics', connection, if_exists='replace', index=False)
+        state_data.to_sql('state_metrics', connection, if_exists='replace', index=False)
+
+        store_fingerprints(connection, fingerprints)
+    print(f"Metrics are now materialized: {len(area_data)} areas, {len(state_data)} states.")
+    return True
@@ -1,15 +1,34 @@
 import os
+import threading
+from functools import partial
+from collections.abc import Mapping
+from dataclasses import asdict
 import pandas as pd
 import sqlalchemy as sql
-from kaggle.api.kaggle_api_extended import KaggleApi
+
+import fetch
+import dataset_cache
+import transforms
+import quality
+from streaming import stream_csv_to_sqlite
+from imputation import impute_in_db
+from incremental import load_incremental
+from bulk_load import bulk_load
+from config import PipelineConfig
+from scheduler import Stage, run_stages
+from sharding import transform_sharded, shard_pool, keep
+from metrics import materialize_metrics
+from indexes import create_indexes, check_query_plans
+from instrumentation import RunReport
+from providers import as_provider, open_sink
+from columnar import write_columnar
+from spatial import build_listing_areas
+from checkpoint import CheckpointStore, file_fingerprint
 
 # Side Functions Blocks
 
-def download_kaggle_datasets(url, _path=''):
-    """ Kaggle API Initialization """
-    api = KaggleApi()
-    api.authenticate()
-    
+def parse_dataset_slug(url):
+    """ Kaggle dataset slug (owner/dataset) from its URL """
     # The expected URL format is: https://www.kaggle.com/datasets/owner_slug/dataset_name
     url_parts = url.split('/datasets/') 
     if len(url_parts) < 2:
@@ -21,22 +40,84 @@ def download_kaggle_datasets(url, _path=''):
     
     owner_slug = dataset_info[0] 
     dataset_name = dataset_info[1].split('/')[0]  
+    return f"{owner_slug}/{dataset_name}"
+
+def find_offline_dataset(slug, mirror_dir=None, cache_dir=dataset_cache.DEFAULT_CACHE_DIR):
+    """ Dataset files from the cache or a local mirror (<mirror_dir>/<owner>/<dataset>/*.csv) """
+    cached = dataset_cache.lookup(slug, cache_dir=cache_dir)
+    if cached:
+        return cached
+    if mirror_dir:
+        dataset_dir = os.path.join(mirror_dir, *slug.split('/'))
+        if os.path.isdir(dataset_dir):
+            return {file: os.path.join(dataset_dir, file) for file in os.listdir(dataset_dir) if file.endswith('.csv')}
+    raise ValueError(f"Offline mode: {slug} is neither cached nor mirrored!")
+
+def fetch_kaggle_dataset(url, _path='', offline=False, mirror_dir=None, cache_dir=dataset_cache.DEFAULT_CACHE_DIR,
+                         files=None, transport=None, retries=fetch.RETRIES):
+    """ Download (or serve from the local cache) a Kaggle dataset, returns {csv file: path}
+        files: only expose these named CSV files (default: every CSV file of the dataset)
+        transport: where archives are downloaded from (fetch.py), default the Kaggle API """
+    slug = parse_dataset_slug(url)
 
-    api.dataset_download_files(f"{owner_slug}/{dataset_name}", path=_path, unzip=True)
+    if offline:
+        # never touches the Kaggle API
+        print(f"Offline mode: serving {slug} locally")
+        cached = find_offline_dataset(slug, mirror_dir, cache_dir)
+    else:
+        # resumable download with retries, skipped on a cache hit of the current version
+        cached = fetch.fetch_dataset(slug, transport or fetch.KaggleTransport(), cache_dir, retries)
 
-    csv_files = [file for file in os.listdir(_path) if file.endswith('.csv')] 
+    csv_files = {file: path for file, path in cached.items() if file.endswith('.csv')} 
     if not csv_files:
         raise ValueError("Couldn't find CSV format file!") 
+    if files is not None:
+        missing = set(files) - set(csv_files)
+        if missing:
+            raise ValueError(f"{slug} has no file named: {sorted(missing)}")
+        csv_files = {file: csv_files[file] for file in files}
+    return dataset_cache.materialize(csv_files, _path or '.')
+
+class LazyCSVFiles(Mapping):
+    """ {csv file: dataframe} whose files are only parsed when they are accessed (once) """
+
+    def __init__(self, csv_files, schemas=None, pushdown=None):
+        self.paths = csv_files
+        self.schemas = schemas or {}
+        self.pushdown = pushdown or {}
+        self._dfs = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, csv_file):
+        csv_path = self.paths[csv_file]
+        with self._lock:
+            if csv_file not in self._dfs:
+                print(f"Loading CSV: {csv_file}")
+                if csv_file in self.schemas:
+                    self._dfs[csv_file] = transforms.read_typed_csv(csv_path, self.schemas[csv_file],
+                                                                    **self.pushdown.get(csv_file, {}))
+                else:
+                    self._dfs[csv_file] = pd.read_csv(csv_path)
+            return self._dfs[csv_file]
 
-    dfs = {} #dictionary of dataframes
-    for csv_file in csv_files:
-        csv_path = os.path.join(_path, csv_file)
-        print(f"Loading CSV: {csv_file}")
-        dfs[csv_file] = pd.read_csv(csv_path)
+    def __iter__(self):
+        return iter(self.paths)
 
-    return dfs
+    def __len__(self):
+        return len(self.paths)
 
-def initialize_sqlite_db(db_name):
+def download_kaggle_datasets(url, _path='', offline=False, mirror_dir=None, cache_dir=dataset_cache.DEFAULT_CACHE_DIR,
+                             schemas=None, files=None, pushdown=None, transport=None, retries=fetch.RETRIES):
+    """ Download (or serve from the local cache) a Kaggle dataset, returns lazy handles of its
+        CSV files: {csv file: dataframe}, each file is parsed on first access.
+        schemas: {csv file: read-time schema}, files without one are read with inferred types
+        files: only these named files (default: every CSV file of the dataset)
+        pushdown: {csv file: {'drop_columns': [...], 'predicate': func}}, see transforms.read_typed_csv
+        transport, retries: see fetch_kaggle_dataset """
+    csv_files = fetch_kaggle_dataset(url, _path, offline, mirror_dir, cache_dir, files, transport, retries)
+    return LazyCSVFiles(csv_files, schemas, pushdown)
+
+def initialize_sqlite_db(db_name, remove_existing=True):
     """ SQLITE Initialization """
     files_dir = './data'
     if not os.path.exists(files_dir):
@@ -44,7 +125,7 @@ def initialize_sqlite_db(db_name):
         print(f"Created directory: {files_dir}")
     db_path = os.path.join(files_dir, db_name)
  
-    if os.path.exists(db_path):
+    if remove_existing and os.path.exists(db_path):
         os.remove(db_path)  # Remove existing file
         print(f"Removed outdated database file: {db_path}")   
     #SQLAlchemy engine for the SQLite database
@@ -52,110 +133,270 @@ def initialize_sqlite_db(db_name):
     print(f"Initialized SQLite database at: {db_path}")
     return engine
     
-# Main Function Block
+# Data sources: Kaggle dataset, CSV file to load, table, key column, transformation & cleaning
+SOURCES = {
+    'cost_of_living': {
+        # Data source 1: US Households Cost of Living dataset
+        'url': "https://www.kaggle.com/datasets/asaniczka/us-cost-of-living-dataset-3171-counties",
+        'file': 'cost_of_living_us.csv',
+        # case_id repeats across the 10 family types of a county, a row is one family type of it
+        'key': ['household_id', 'parents_per_household', 'children_per_household'],
+        # data quality: columns where 0 means missing, highest allowed value per metric (quality.py)
+        'zero_columns': [],
+        'quality': {'nulls': 0, 'duplicate_keys': 0},
+        'shard_column': 'state',
+        'schema': transforms.cost_of_living_schema,
+        # read-time pushdown: columns never parsed, rows never kept (transforms.read_typed_csv)
+        'pushdown': transforms.cost_of_living_pushdown,
+        'transform': transforms.transform_cost_of_living,
+        'clean': transforms.clean_cost_of_living,
+        'dtypes': transforms.cost_of_living_dtypes,
+        # streaming: cleaning needs the state medians of the whole table, so it runs after the load
+        'chunk_transform': transforms.transform_cost_of_living,
+        'post_load': lambda engine: impute_in_db(engine, 'cost_of_living', transforms.cost_of_living_imputation),
+    },
+    'house_listings': {
+        # Data source 2: US House Listings Prices dataset
+        'url': "https://www.kaggle.com/datasets/febinphilips/us-house-listings-2023",
+        'file': 'original_extracted_df.csv',
+        'key': None,
+        'zero_columns': ['property_price', 'property_area_meters'],
+        'quality': {'nulls': 0, 'zeros': 0, 'latitude.nulls': None, 'longitude.nulls': None},
+        'shard_column': 'State',
+        'schema': transforms.house_listings_schema,
+        'pushdown': transforms.house_listings_pushdown,
+        'transform': transforms.transform_house_listings,
+        'clean': transforms.clean_house_listings,
+        'dtypes': transforms.house_listings_dtypes,
+        'chunk_transform': transforms.transform_and_clean_house_listings,
+        'post_load': None,
+    },
+}
 
-def main():
+def make_transport(config):
+    """ Download transport of the settings: the dataset server at download_url, or Kaggle """
+    if config.download_url:
+        return fetch.HTTPTransport(config.download_url, max_connections=config.connections)
+    return fetch.KaggleTransport(max_connections=config.connections)
 
-    sqlite_db_path = 'train_data.sqlite'
+def extract_source(source, config, transport=None):
+    """ Data Extracting: the source dataframe, or only its CSV path when streaming """
+    if config.streaming:
+        return fetch_kaggle_dataset(source['url'], 'data', config.offline, config.mirror_dir,
+                                    files=[source['file']], transport=transport,
+                                    retries=config.retries)[source['file']]
+    return download_kaggle_datasets(source['url'], 'data', config.offline, config.mirror_dir,
+                                    schemas={source['file']: source['schema']}, files=[source['file']],
+                                    pushdown={source['file']: source['pushdown']}, transport=transport,
+                                    retries=config.retries)[source['file']]
 
-    """ Data Extracting """
-    # Data source 1: US Households Cost of Living dataset
-    url_cost_of_living_us = "https://www.kaggle.com/datasets/asaniczka/us-cost-of-living-dataset-3171-counties"
-    dfs = download_kaggle_datasets(url_cost_of_living_us,'data')
-    
-    """ Data Transformation """
-    dfs['cost_of_living_us.csv'].columns = dfs['cost_of_living_us.csv'].columns.str.strip()
-    
-    cost_of_living_df = dfs['cost_of_living_us.csv']
-    cost_of_living_df['parents_per_household'] = cost_of_living_df['family_member_count'].str.extract(r'(\d+)p')[0].astype('int64') 
-    cost_of_living_df['children_per_household'] = cost_of_living_df['family_member_count'].str.extract(r'p(\d+)c')[0].astype('int64')
+class KaggleProvider:
+    """ Default provider: the Kaggle datasets (or the dataset server of download_url), all
+        sources downloading concurrently through one transport within its connection limit """
 
-    columns_to_drop_1 = ['isMetro', 'areaname', 'county','family_member_count' ] #irrelevant
-    dfs['cost_of_living_us.csv'].drop(columns=columns_to_drop_1, inplace=True)
-    
-    # rename columns for calculation convenience for the next #Issues
-    dfs['cost_of_living_us.csv'].rename(columns={
-                                            'case_id': 'household_id',
-                                            'housing_cost': 'housing_expenses', 
-                                            'food_cost': 'food_expenses', 
-                                            'transportation_cost': 'transport_expenses',
-                                            'healthcare_cost': 'healthcare_expenses',
-                                            'other_necessities_cost': 'other_necessities_expenses',
-                                            'childcare_cost': 'childcare_expenses',
-                                            'taxes': 'household_taxes',
-                                            'total_cost': 'total_household_expenses',
-                                              }, 
-                                            inplace=True)
-    """
-    Data Cleaning
-    During data cleaning there were 10 missing values for overall dataframe. 
-    During filtering the missing values were part of 'MO' state.
-    Since there are 1161 values for that state, we will use imputation median fill method.
-
-    """
-    median_expenses = dfs['cost_of_living_us.csv'][dfs['cost_of_living_us.csv']['state'] == 'MO']['total_household_expenses'].median()
-    dfs['cost_of_living_us.csv'].loc[dfs['cost_of_living_us.csv']['state'] == 'MO', 'total_household_expenses'] = \
-    dfs['cost_of_living_us.csv'].loc[dfs['cost_of_living_us.csv']['state'] == 'MO', 'total_household_expenses'].fillna(median_expenses)
-    
-    """ Data Loading """
-    engine = initialize_sqlite_db(sqlite_db_path)
-    if 'cost_of_living_us.csv' in dfs:
-        dfs['cost_of_living_us.csv'].to_sql('cost_of_living', engine, if_exists='replace', index=False)
-        print("Households' cost of living data is now inserted into SQLite database.")
+    def __init__(self, config):
+        self.transport = make_transport(config)
+
+    def __call__(self, table_name, source, config):
+        return extract_source(source, config, self.transport)
+
+    def fingerprint(self, table_name, source, config):
+        """ The cached file of the current dataset version, fetched if it is not cached yet """
+        csv_path = fetch_kaggle_dataset(source['url'], 'data', config.offline, config.mirror_dir,
+                                        files=[source['file']], transport=self.transport,
+                                        retries=config.retries)[source['file']]
+        return file_fingerprint(csv_path)
+
+def transform_source(source, df, config, report=None, step_name='transform'):
+    """ Data Transformation & Cleaning (done chunk by chunk at load time when streaming).
+        With a run report, both steps are recorded as <step_name>.transform / .clean """
+    if config.streaming:
+        return df
+    transform, clean = source['transform'], source['clean']
+    pool = shard_pool(config.shard_workers) if config.shard_workers > 1 else None
+    if pool:
+        # one pass over the state shards per step, on one pool, so both are recorded
+        transform = partial(transform_sharded, transform=transform, clean=keep, shard_column=source['shard_column'],
+                            workers=config.shard_workers, pool=pool)
+        clean = partial(transform_sharded, transform=keep, clean=clean, shard_column='state',
+                        workers=config.shard_workers, pool=pool)
+    if report:
+        transform = report.instrument(f'{step_name}.transform', transform)
+        clean = report.instrument(f'{step_name}.clean', clean)
+    try:
+        df = transform(df)
+        return clean(df)
+    finally:
+        if pool:
+            pool.shutdown()
+
+def load_source(table_name, source, df, engine, config):
+    """ Data Loading: streamed, incremental delta, bulk loader or to_sql. Returns the rows loaded. """
+    if config.streaming:
+        rows = stream_csv_to_sqlite(df, table_name, engine, source['chunk_transform'], source['dtypes'],
+                                    config.chunk_rows, config.memory_limit_mb, source['schema'], **source['pushdown'])
+        if source['post_load']:
+            source['post_load'](engine)
+    elif config.incremental:
+        added, changed, removed = load_incremental(df, table_name, engine, source['key'])
+        print(f"{table_name} is now updated: {added} added, {changed} changed, {removed} removed.")
+    elif config.bulk_load:
+        bulk_load(df, table_name, engine, journal_mode=config.journal_mode, synchronous=config.synchronous)
     else:
-        print("File is not found!")
-    
-    # print(dfs['cost_of_living_us.csv'].head())
+        df.to_sql(table_name, engine, if_exists='replace', index=False)
+    if not config.streaming:
+        rows = len(df)
+    print(f"{table_name} data is now inserted into SQLite database.")
+    return rows
 
-    """ Data Extracting """
-    # Data source 2: US House Listings Prices dataset
-    url_house_listings = "https://www.kaggle.com/datasets/febinphilips/us-house-listings-2023"
-    dfs = download_kaggle_datasets(url_house_listings, 'data')
+def profile_source(table_name, source, df, engine, config, profiles):
+    """ Data Quality: profile of the transformed frame (of the loaded table when streaming),
+        checked against the thresholds of the source. Passes the frame on. """
+    if config.streaming:
+        with engine.connect() as connection:
+            profile = quality.profile_table(connection, table_name, source['key'], source['zero_columns'])
+    else:
+        profile = quality.profile_frame(df, table_name, source['key'], source['zero_columns'])
+    profiles[table_name] = quality.check_thresholds(profile, source['quality'])
+    return df
 
-    """ Data Transformation """
-    columns_to_drop_2 = ['City', 'Street', 'Zipcode',  #irrelevant (for now)
-                         'Bedroom', 'Bathroom', 'LotArea',  #too many nan and missing values
-                         'MarketEstimate', 'RentEstimate',  #irrelevant 
-                         'ConvertedLot', 'LotUnit', #irrelevant 
-                         'Latitude', 'Longitude'] #irrelevant
+def export_columnar(table_name, df, engine, config):
+    """ Columnar copy of the loaded frame (read back from the table in chunks when streaming) """
+    if config.streaming:
+        df = pd.read_sql_query(f"SELECT * FROM {table_name}", engine, chunksize=config.chunk_rows or 100_000)
+    write_columnar(df, table_name, config.columnar_dir, config.columnar)
 
-    dfs['original_extracted_df.csv'].drop(columns=columns_to_drop_2, inplace=True)
-    
-    dfs['original_extracted_df.csv'].rename(columns={
-                                            'State': 'state',
-                                            'Area': 'property_area_meters',
-                                            'PPSq': 'price_per_sq_meter', 
-                                            'Price': 'property_price', 
-                                              },
-                                            inplace=True)
-    
-    """
-    Data Cleaning
-    During data cleaning there were around 5k missing values out of 24k rows of data.
-    We will drop rows with missing values in all columns to avoid reducing variance.
-    We will drop logical incorrect data rows per columns.
+def verify_database(engine, table_names):
+    """ Every loaded table exists and has rows """
+    with engine.connect() as connection:
+        for table_name in table_names:
+            count = connection.exec_driver_sql(f"SELECT COUNT(*) FROM {table_name}").scalar()
+            if not count:
+                raise ValueError(f"There is no data in the '{table_name}' table.")
+            print(f"Verified {table_name}: {count} rows")
 
-    """
-    
-    dfs['original_extracted_df.csv'].dropna(how='all', inplace=True)
-    
-    dfs['original_extracted_df.csv'] = dfs['original_extracted_df.csv'][~dfs['original_extracted_df.csv']['property_price'].isin([0, 1])
-                                                                         & dfs['original_extracted_df.csv']['property_price'].notna()]
-    dfs['original_extracted_df.csv'] = dfs['original_extracted_df.csv'][~dfs['original_extracted_df.csv']['property_area_meters'].isin([0, 1])
-                                                                        & dfs['original_extracted_df.csv']['property_area_meters'].notna()]
+def build_stages(engine, config, report=None, provider=None, checkpoints=None):
+    """ Stage graph: extract -> transform -> load per source, then a final verification,
+        the managed indexes and the materialized metrics.
+        With quality checks, every transformed frame is profiled before its load (streamed
+        tables right after it) and the profiles are saved once everything is verified.
+        Columnar copies are written alongside the load (after it when streaming).
+        With a boundary file, the listings are assigned to counties once everything is verified.
+        Sources are independent until the end, only the SQLite writes are serialized.
+        With a run report (instrumentation.py) every stage is recorded as a step.
+        provider: where the sources are extracted from (providers.py), default Kaggle
+        checkpoints: CheckpointStore (checkpoint.py) keeping the extracted and transformed
+                     frames, loads already done with the same inputs are skipped """
+    provider = provider or KaggleProvider(config)
+    stages = []
+    profiles = {}
+    loaded = []
+    for table_name, source in SOURCES.items():
+        stages += [
+            Stage(f'extract_{table_name}',
+                  lambda table_name=table_name, source=source: provider(table_name, source, config)),
+            Stage(f'transform_{table_name}',
+                  lambda df, table_name=table_name, source=source:
+                      transform_source(source, df, config, report, f'transform_{table_name}'),
+                  deps=(f'extract_{table_name}',)),
+        ]
+        profile = lambda df, table_name=table_name, source=source: \
+            profile_source(table_name, source, df, engine, config, profiles)
+        load = lambda df, table_name=table_name, source=source: load_source(table_name, source, df, engine, config)
+        if checkpoints:
+            extract, transform = stages[-2:]
+            fingerprint = getattr(provider, 'fingerprint', None)
+            extract.func = checkpoints.stage(
+                extract.name, extract.func, code=(transforms,), settings=(config.streaming, pd.__version__),
+                fingerprint=fingerprint and (lambda table_name=table_name, source=source:
+                                             fingerprint(table_name, source, config)))
+            transform.func = checkpoints.stage(
+                transform.name, transform.func, code=(source['transform'], source['clean'], impute_in_db),
+                deps=(extract.name,), settings=(config.streaming,))
+            load = checkpoints.load_stage(
+                f'load_{table_name}', load, engine, table_name, code=(source['chunk_transform'],),
+                deps=(transform.name,), settings=(config.streaming, config.incremental, config.bulk_load))
+        if not config.quality:
+            stages.append(Stage(f'load_{table_name}', load, deps=(f'transform_{table_name}',), lock='sqlite'))
+            loaded.append(f'load_{table_name}')
+        elif config.streaming:
+            stages += [Stage(f'load_{table_name}', load, deps=(f'transform_{table_name}',), lock='sqlite'),
+                       Stage(f'quality_{table_name}', profile, deps=(f'load_{table_name}',), lock='sqlite')]
+            loaded.append(f'quality_{table_name}')
+        else:
+            # fail fast: nothing is written if the frame breaks a threshold
+            stages += [Stage(f'quality_{table_name}', profile, deps=(f'transform_{table_name}',)),
+                       Stage(f'load_{table_name}', load, deps=(f'quality_{table_name}',), lock='sqlite')]
+            loaded.append(f'load_{table_name}')
+        if config.columnar:
+            export = lambda df, table_name=table_name: export_columnar(table_name, df, engine, config)
+            if config.streaming:
+                stages.append(Stage(f'columnar_{table_name}', export, deps=(loaded[-1],), lock='sqlite'))
+            else:
+                final_frame = f'quality_{table_name}' if config.quality else f'transform_{table_name}'
+                stages.append(Stage(f'columnar_{table_name}', export, deps=(final_frame,)))
+            loaded.append(f'columnar_{table_name}')
+    stages.append(Stage('verify', lambda *loaded: verify_database(engine, list(SOURCES)),
+                        deps=tuple(loaded), lock='sqlite'))
+    last = 'verify'
+    if config.quality:
+        stages.append(Stage('quality', lambda verified: quality.save_profiles(engine, list(profiles.values())),
+                            deps=(last,), lock='sqlite'))
+        last = 'quality'
+    if config.boundaries:
+        # county of every listing, from its coordinates (spatial.py)
+        stages.append(Stage('listing_areas', lambda previous: build_listing_areas(engine, config.boundaries),
+                            deps=(last,), lock='sqlite'))
+        last = 'listing_areas'
+    if config.indexes:
+        # deferred until every table is loaded, then the hot queries must not scan whole tables
+        stages.append(Stage('indexes', lambda verified: (create_indexes(engine), check_query_plans(engine)),
+                            deps=(last,), lock='sqlite'))
+        last = 'indexes'
+    if config.metrics:
+        stages.append(Stage('metrics', lambda previous: materialize_metrics(engine), deps=(last,), lock='sqlite'))
+    if report:
+        for stage in stages:
+            stage.func = report.instrument(stage.name, stage.func)
+    return stages
 
-    
-    
-    # print(dfs['original_extracted_df.csv'].isnull().sum())
+# Main Function Block
 
-    """ Data Loading """
-    if 'original_extracted_df.csv' in dfs:
-        dfs['original_extracted_df.csv'].to_sql('house_listings', engine, if_exists='replace', index=False)
-        print("House listings data is now inserted into SQLite database.")
+def main(config=None, sources=None, sink=None, **settings):
+    """ Run the pipeline. Settings are described in config.py, e.g. main(offline=True, workers=1)
+        sources: directory of the source CSV files, {table: raw dataframe} or a provider (providers.py),
+                 default the Kaggle datasets
+        sink: database URL ('sqlite://' in memory), SQLite file path or engine, default ./data/train_data.sqlite
+        Returns the engine of the loaded database. """
+    config = config or PipelineConfig.from_env(**settings)
+    if config.streaming and config.incremental:
+        raise ValueError("Streaming and incremental loading cannot be combined!")
+
+    # the database of a run that did not finish is kept, its loads are not repeated
+    checkpoints = CheckpointStore(config.checkpoint_dir) if config.checkpoints else None
+    resume = checkpoints is not None and not checkpoints.previous_run_finished()
+    if resume:
+        print(f"Resuming the unfinished run of {config.checkpoint_dir}")
+    if sink is None:
+        sqlite_db_path = 'train_data.sqlite'
+        engine = initialize_sqlite_db(sqlite_db_path, remove_existing=not (config.incremental or resume))
     else:
-        print("File is not found!")    
+        engine = open_sink(sink, remove_existing=not (config.incremental or resume))
+    provider = as_provider(sources) if sources is not None else None
+
+    report = RunReport(config.run_report, config.profile, settings=asdict(config))
+    if checkpoints:
+        checkpoints.mark_run('running')
+    try:
+        run_stages(build_stages(engine, config, report, provider, checkpoints), max_workers=config.workers)
+    finally:
+        report.close()
+    if checkpoints:
+        checkpoints.mark_run('finished')
 
-    # print(dfs['original_extracted_df.csv'].head())
+    if config.cache_max_bytes is not None or config.cache_max_age_days is not None:
+        dataset_cache.evict(max_bytes=config.cache_max_bytes, max_age_days=config.cache_max_age_days)
+    return engine
 
 if __name__ == "__main__":
     main()
@@ -8,7 +8,14 @@ echo "Python packages installed successfully"
 
 echo "Ensuring Kaggle API credentials are configured..."
 KAGGLE_PATH="$HOME/.kaggle/kaggle.json"
-if [ ! -f $KAGGLE_PATH ]; then
+# same rule as config.py: empty, 0, false and no mean online
+case "$(echo "$PIPELINE_OFFLINE" | tr '[:upper:]' '[:lower:]')" in
+    ""|0|false|no) OFFLINE="" ;;
+    *) OFFLINE=1 ;;
+esac
+if [ -n "$OFFLINE" ]; then
+    echo "Offline mode: datasets are served from the local cache, Kaggle API is not used"
+elif [ ! -f $KAGGLE_PATH ]; then
     echo "Your Kaggle API credentials are not set up"
     echo "To set them up:"
     echo "1. Go to https://www.kaggle.com/account"
@@ -0,0 +1,86 @@
+""" Pluggable sources and sinks of main().
+
+    A source provider is called as provider(table_name, source, config) and returns the
+    raw dataframe of a source (see pipeline.SOURCES), or the path of its CSV file when
+    streaming. The default provider downloads the Kaggle datasets (pipeline.KaggleProvider);
+    the ones here serve fixture data without network access. A provider with a
+    fingerprint(table_name, source, config) method (the identity of the data it would
+    return) gets its extracted frames checkpointed (checkpoint.py):
+
+        main(sources='tests/fixtures', sink='sqlite://')                    # directory of the CSV files
+        main(sources={'cost_of_living': df1, 'house_listings': df2}, sink='sqlite://')
+
+    A sink is a database URL ('sqlite://' is an in-memory database), a file path or an engine.
+
+    """
+
+import os
+
+import sqlalchemy as sql
+from sqlalchemy.pool import StaticPool
+
+import transforms
+from checkpoint import file_fingerprint, frame_fingerprint
+
+
+class DirectoryProvider:
+    """ Source CSV files (e.g. cost_of_living_us.csv) from one local directory """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, table_name, source, config):
+        csv_path = os.path.join(self.directory, source['file'])
+        if not os.path.exists(csv_path):
+            raise ValueError(f"{table_name}: no {source['file']} in {self.directory}!")
+        if config.streaming:
+            return csv_path
+        print(f"Loading CSV: {csv_path}")
+        return transforms.read_typed_csv(csv_path, source['schema'], **source.get('pushdown', {}))
+
+    def fingerprint(self, table_name, source, config):
+        csv_path = os.path.join(self.directory, source['file'])
+        return file_fingerprint(csv_path) if os.path.exists(csv_path) else None
+
+
+class DataFrameProvider:
+    """ Raw source dataframes held in memory, {table name: dataframe} """
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __call__(self, table_name, source, config):
+        if config.streaming:
+            raise ValueError("In-memory sources cannot be streamed!")
+        if table_name not in self.frames:
+            raise ValueError(f"No dataframe given for {table_name}!")
+        # the transformations work in place, the caller's frame stays untouched
+        return self.frames[table_name].copy()
+
+    def fingerprint(self, table_name, source, config):
+        return frame_fingerprint(self.frames[table_name]) if table_name in self.frames else None
+
+
+def as_provider(sources):
+    """ Provider of a directory path, a {table name: dataframe} dict or a provider itself """
+    if isinstance(sources, (str, os.PathLike)):
+        return DirectoryProvider(sources)
+    if isinstance(sources, dict):
+        return DataFrameProvider(sources)
+    if callable(sources):
+        return sources
+    raise ValueError(f"Unsupported sources: {sources!r}")
+
+
+def open_sink(sink, remove_existing=True):
+    """ Engine of a database URL, SQLite file path or engine. In-memory SQLite databases
+        share one connection, so every stage thread sees the same database. """
+    if isinstance(sink, sql.engine.Engine):
+        return sink
+    url = sql.engine.make_url(sink if '://' in str(sink) else f'sqlite:///{sink}')
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return sql.create_engine(url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+    if url.get_backend_name() == 'sqlite' and remove_existing and os.path.exists(url.database):
+        os.remove(url.database)
+        print(f"Removed outdated database file: {url.database}")
+    return sql.create_engine(url)
@@ -0,0 +1,95 @@
+""" Data-quality profiles of the loaded tables, collected while the pipeline runs.
+
+    Every transformed frame is profiled in one vectorized pass before it is loaded:
+    null counts, value ranges, zero values of the columns where zero means missing
+    (price, area) and duplicate keys (of a key column or a composite key). Streamed tables never sit in memory, so they are
+    profiled after the load with a single SQL scan instead. The profiles are checked
+    against the thresholds of the source (pipeline.SOURCES) and saved in the small
+    data_quality table (table_name, column_name, metric, value), which the tests and
+    monitors read instead of rescanning the data. Table-level metrics use column '*'.
+
+    """
+
+import pandas as pd
+
+SUMMARY_TABLE = 'data_quality'
+TABLE_LEVEL = '*'
+
+
+def _long_format(table_name, stats, table_stats):
+    profile = (stats.rename_axis('column_name').reset_index()
+               .melt(id_vars='column_name', var_name='metric', value_name='value')
+               .dropna(subset=['value']))
+    table_rows = pd.DataFrame({'column_name': TABLE_LEVEL, 'metric': list(table_stats),
+                               'value': list(table_stats.values())})
+    profile = pd.concat([table_rows, profile], ignore_index=True)
+    profile.insert(0, 'table_name', table_name)
+    profile['value'] = profile['value'].astype('float64')
+    return profile
+
+
+def _key_columns(key_column):
+    return [key_column] if isinstance(key_column, str) else list(key_column)
+
+
+def profile_frame(df, table_name, key_column=None, zero_columns=()):
+    """ Quality profile of a dataframe in one vectorized pass """
+    numeric = df.select_dtypes('number')
+    stats = pd.DataFrame({'nulls': df.isna().sum(), 'min': numeric.min(), 'max': numeric.max(),
+                          'zeros': (df[list(zero_columns)] == 0).sum()})
+    table_stats = {'rows': len(df)}
+    if key_column is not None:
+        table_stats['duplicate_keys'] = int(df.duplicated(subset=_key_columns(key_column)).sum())
+    return _long_format(table_name, stats, table_stats)
+
+
+def profile_table(connection, table_name, key_column=None, zero_columns=()):
+    """ The same profile of a loaded table, computed in a single SQL scan """
+    columns = [(row[1], row[2].upper()) for row in connection.exec_driver_sql(f"PRAGMA table_info({table_name})")]
+    numeric = [name for name, type_name in columns if any(t in type_name for t in ('INT', 'FLOAT', 'REAL', 'NUM'))]
+
+    aggregates = {('*', 'rows'): "COUNT(*)"}
+    if key_column is not None:
+        keys = ', '.join(_key_columns(key_column))
+        aggregates[('*', 'duplicate_keys')] = f"COUNT(*) - (SELECT COUNT(*) FROM (SELECT DISTINCT {keys} FROM {table_name}))"
+    for name, _ in columns:
+        aggregates[(name, 'nulls')] = f"SUM({name} IS NULL)"
+    for name in numeric:
+        aggregates[(name, 'min')] = f"MIN({name})"
+        aggregates[(name, 'max')] = f"MAX({name})"
+    for name in zero_columns:
+        aggregates[(name, 'zeros')] = f"SUM({name} = 0)"
+    values = connection.exec_driver_sql(f"SELECT {', '.join(aggregates.values())} FROM {table_name}").fetchone()
+
+    results = dict(zip(aggregates, values))
+    table_stats = {metric: results.pop((column, metric)) for column, metric in list(results) if column == '*'}
+    stats = pd.Series(results, dtype='float64').unstack()
+    return _long_format(table_name, stats, table_stats)
+
+
+def check_thresholds(profile, thresholds):
+    """ Fail if a metric exceeds its threshold, thresholds: {metric: highest allowed value};
+        '<column>.<metric>' keys override the metric for one column, None leaves it unchecked """
+    keys = profile['column_name'] + '.' + profile['metric']
+    limits = profile['metric'].map(thresholds).astype('float64')
+    overridden = keys.isin(list(thresholds))
+    limits[overridden] = keys[overridden].map(thresholds).astype('float64')
+    violations = profile[limits.notna() & (profile['value'] > limits)]
+    if len(violations):
+        details = '; '.join(f"{row.table_name}.{row.column_name} {row.metric}={row.value:g}"
+                            for row in violations.itertuples())
+        raise ValueError(f"Data quality thresholds exceeded: {details}")
+    return profile
+
+
+def save_profiles(engine, profiles):
+    """ Replace the summary rows of the profiled tables """
+    summary = pd.concat(profiles, ignore_index=True)
+    tables = summary['table_name'].unique().tolist()
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} "
+                                   f"(table_name TEXT, column_name TEXT, metric TEXT, value FLOAT)")
+        connection.exec_driver_sql(f"DELETE FROM {SUMMARY_TABLE} WHERE table_name IN ({', '.join('?' * len(tables))})",
+                                   tuple(tables))
+        summary.to_sql(SUMMARY_TABLE, connection, if_exists='append', index=False)
+    print(f"Data quality summary saved: {len(summary)} metrics of {', '.join(tables)}")
@@ -0,0 +1,424 @@
+""" Figures of the data analysis, and a headless report mode that renders all of them to files.
+
+    Every figure is built by its own function from a small input frame (see figure_inputs),
+    so data-analysis.py can show them interactively while the report renders them with a
+    non-interactive backend, concurrently on a process pool. A figure whose input data and
+    rendering code did not change since the last report is skipped, as long as its file exists.
+
+    Headless usage: python project/report.py [output directory] [--intervals]
+
+    """
+
+import os
+import sys
+import json
+import hashlib
+import multiprocessing
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+import metrics
+import columnar
+import checkpoint
+import uncertainty
+
+DEFAULT_DB_PATH = './data/train_data.sqlite'
+DEFAULT_REPORT_DIR = './data/report'
+MANIFEST_FILE = 'manifest.json'
+TABLE_ROWS = 15  # rows of the table figures
+
+map_abbr_table_to_name_map = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia", "FL": "Florida",
+    "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana",
+    "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine",
+    "MD": "Maryland", "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi",
+    "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire",
+    "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota",
+    "OH": "Ohio", "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island",
+    "SC": "South Carolina", "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah",
+    "VT": "Vermont", "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin",
+    "WY": "Wyoming"
+}
+
+# pastel to purple
+my_palette = [
+    "#800080",
+    "#9B30FF",
+    "#DDA0DD",
+    "#FAD6A5",
+    "#F8C8B5",
+    "#5D3FD3",
+    "#F5F5DC",
+    "#D8BFD8",
+    "#777777"
+]
+
+# <--------------------------------------Inputs-------------------------------------->
+
+def read_tables(db_path=DEFAULT_DB_PATH, columnar_dir=columnar.DEFAULT_COLUMNAR_DIR):
+    """ Both loaded tables: memory-mapped from their columnar copies if the pipeline wrote
+        them (PIPELINE_COLUMNAR=arrow), otherwise read from the SQLite database """
+    if all(columnar.table_format(table_name, columnar_dir) for table_name in ('cost_of_living', 'house_listings')):
+        return (columnar.read_columnar('cost_of_living', directory=columnar_dir),
+                columnar.read_columnar('house_listings', directory=columnar_dir))
+
+    import sqlite3
+    with sqlite3.connect(db_path) as database_connection:
+        df_cost_of_living = pd.read_sql_query("SELECT * FROM cost_of_living", database_connection)
+        df_house_listings = pd.read_sql_query("SELECT * FROM house_listings", database_connection)
+    return df_cost_of_living, df_house_listings
+
+def read_metrics(db_path=DEFAULT_DB_PATH):
+    """ Materialized (area_data, state_data) of the database (metrics.py), None if they are
+        missing or older than the source tables """
+    import sqlite3
+    import fingerprints
+    if not os.path.exists(db_path):
+        return None
+    with closing(sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)) as connection:
+        stored = fingerprints.stored_fingerprints(connection)
+        if not stored or stored != fingerprints.source_fingerprints(connection):
+            return None
+        area_data = pd.read_sql_query("SELECT * FROM area_metrics", connection)
+        state_data = pd.read_sql_query("SELECT * FROM state_metrics", connection)
+    if not {f'sum_{column}' for column in metrics.expense_columns} <= set(area_data.columns):
+        return None  # materialized before the expense totals were kept
+    return area_data, state_data
+
+def read_report_tables(db_path=DEFAULT_DB_PATH, columnar_dir=columnar.DEFAULT_COLUMNAR_DIR):
+    """ df_cost_of_living, df_house_listings, area_data, state_data for figure_inputs. With current
+        materialized metrics, only the first rows of cost_of_living are read (for its table figure),
+        otherwise both tables and no metrics (figure_inputs computes them) """
+    materialized = read_metrics(db_path)
+    if materialized is None:
+        return (*read_tables(db_path, columnar_dir), None, None)
+
+    import sqlite3
+    with closing(sqlite3.connect(f'file:{os.path.abspath(db_path)}?mode=ro', uri=True)) as connection:
+        df_cost_of_living = pd.read_sql_query(f"SELECT * FROM cost_of_living LIMIT {TABLE_ROWS}", connection)
+        df_house_listings = pd.read_sql_query("SELECT * FROM house_listings", connection)
+    return (df_cost_of_living, df_house_listings, *materialized)
+
+def figure_inputs(df_cost_of_living, df_house_listings, area_data=None, state_data=None, intervals=False):
+    """ The (small) input frame of every figure. area_data / state_data: the materialized
+        metrics (read_metrics), computed from the tables if not given. intervals: add the
+        (bootstrapped, slower) 95% intervals of ECLIR, HCB and PIR """
+    if area_data is None:
+        area_data = metrics.area_metrics(metrics.area_cube(df_cost_of_living))
+    if state_data is None:
+        state_data = metrics.state_metrics(area_data, df_house_listings)
+
+    if intervals:
+        # 95% bootstrap intervals of the state metrics: <metric>_lower / <metric>_upper columns
+        bounds = uncertainty.state_intervals(area_data, df_house_listings).pivot(
+            index='state', columns='metric', values=['lower', 'upper'])
+        bounds.columns = [f'{metric}_{bound}' for bound, metric in bounds.columns]
+        state_data = state_data.merge(bounds, left_on='state', right_index=True, how='left')
+
+    def with_bounds(metric):
+        return [metric] + [f'{metric}_{bound}' for bound in ('lower', 'upper') if f'{metric}_{bound}' in state_data]
+
+    unnecessary_columns = ['total_household_expenses', 'parents_per_household', 'children_per_household'] #irrelevant to analysis later
+
+    # group unique areas per state
+    area_count_per_state = area_data.groupby('state', observed=True).size().reset_index(name='Area_Count')
+    area_count_per_state['state_long_name'] = area_count_per_state['state'].map(map_abbr_table_to_name_map)
+
+    # the expenses by state, housing plus taxes
+    state_expenses = area_data.groupby('state', observed=True)[[f'sum_{column}' for column in metrics.expense_columns]].sum()
+    state_expenses.columns = metrics.expense_columns
+    state_expenses['the_housing_expenses'] = state_expenses['housing_expenses'] + state_expenses['household_taxes']
+    state_expenses = state_expenses[['food_expenses', 'transport_expenses', 'healthcare_expenses',
+                                     'other_necessities_expenses', 'childcare_expenses', 'the_housing_expenses']]
+
+    pir = state_data.dropna(subset=['price_to_income_ratio'])
+
+    return {
+        'cost_of_living_table': df_cost_of_living.drop(columns=unnecessary_columns).head(TABLE_ROWS),
+        'house_listings_table': df_house_listings.head(TABLE_ROWS),
+        'area_map': area_count_per_state,
+        'expenses_by_state': state_expenses,
+        'price_boxplot': df_house_listings[['state', 'property_price']],
+        'eclir': state_data[['state', *with_bounds('state_eclir')]].sort_values(by='state_eclir', ascending=True),
+        'hcb': state_data[['state', *with_bounds('state_hcb')]].sort_values(by='state_hcb', ascending=True),
+        'pir_pie': pir['price_to_income_category'].value_counts().reindex(metrics.pir_categories).fillna(0),
+        'pir_line': pir[['state', *with_bounds('price_to_income_ratio')]],
+    }
+
+# <--------------------------------------Representation of data-------------------------------------->
+
+def _table_figure(df_print, title):
+    fig, ax = plt.subplots(figsize=(18, 6))
+    ax.axis('off')
+
+    # Light-purple even rows, white odd rows (row 1 is the first data row)
+    row_colours = np.where(np.arange(1, len(df_print) + 1) % 2 == 0, '#f3f3f9', '#ffffff')
+    cell_colours = np.repeat(row_colours[:, None], len(df_print.columns), axis=1)
+
+    table = ax.table(cellText=df_print.astype(str).values, colLabels=df_print.columns,
+                     cellColours=cell_colours, colColours=['black'] * len(df_print.columns), loc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(6)
+    table.auto_set_column_width(list(range(len(df_print.columns))))
+    for i in range(len(df_print.columns)):
+        table[0, i].set_text_props(weight='bold', color='lavender')
+
+    ax.text(0.5, 0.85, title, ha='center', va='center', fontsize=16, weight='bold', transform=ax.transAxes)
+    fig.tight_layout()
+    return fig
+
+def cost_of_living_table(df_print):
+    return _table_figure(df_print, "Cost of Living in the U.S")
+
+def house_listings_table(df_print):
+    return _table_figure(df_print, "House Prices in the U.S")
+
+# <--------------------------------------MAP AREAS-------------------------------------->
+
+def area_map(area_count_per_state):
+    import plotly.express as px
+    import geometry
+
+    # details of the choropleth map
+    fig_map = px.choropleth(area_count_per_state,
+                            geojson=geometry.load_states_geojson('low'),
+                            locations='state_long_name',
+                            featureidkey="properties.name",
+                            color='Area_Count',
+                            hover_name='state',               #details when hovering
+                            color_continuous_scale='Purples', #palette of purples
+                            title='Areas per State')
+
+    # zoom to U.S locations only
+    fig_map.update_geos(fitbounds="locations", visible=False)
+
+    # more detailed customization of the map
+    fig_map.update_layout(
+        geo=dict(showframe=False, showcoastlines=True),
+        title="Area Count per State"
+    )
+    return fig_map
+
+# <--------------------------------------Distribution of expenses/ state-------------------------------------->
+
+def expenses_by_state(state_expenses):
+    # rotate to horizontal bar
+    ax = state_expenses.plot(kind='barh', stacked=True, figsize=(14, 7), colormap='twilight_shifted')
+
+    # visualization of the stack-plot
+    ax.set_title('Total Living Expenses by State', fontsize=16)
+    ax.set_xlabel('Total Expenses ($)', fontsize=12)
+    ax.set_ylabel('State', fontsize=12)
+    ax.legend(title='Expense Categories', bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.figure.tight_layout()
+    return ax.figure
+
+# <--------------------------------------Property prices boxplot-------------------------------------->
+
+def price_boxplot(df_house_listings):
+    import seaborn as sns
+
+    fig = plt.figure(figsize=(10, 6))
+
+    # use of sns for aesthetic presentation
+    sns.boxplot(x='state', y='property_price', data=df_house_listings, palette=my_palette)
+
+    # visualization of the boxplot
+    plt.title('Property Prices by State', fontsize=16)
+    plt.xlabel('State', fontsize=14)
+    plt.ylabel('Property Price', fontsize=14)
+    plt.xticks(rotation=90)
+    plt.ylim(0, 2000000) # for clearer visualization
+    plt.tight_layout()
+    return fig
+
+# <--------------------------------------Essential Cost of Living to Income Ratio-------------------------------------->
+
+def eclir(state_ECLIR_sorted):
+    import seaborn as sns
+
+    # sns for aesthetic
+    purple_palette = sns.color_palette("ch:s=-.2,r=.6", len(state_ECLIR_sorted))
+
+    # visualize by barchart
+    fig = plt.figure(figsize=(16, 10))
+    plt.bar(state_ECLIR_sorted['state'], state_ECLIR_sorted['state_eclir'], color=purple_palette)
+    _error_bars(state_ECLIR_sorted, 'state_eclir')
+    plt.title('State-Level Essential Cost of Living to Income Ratio (ECLIR)', fontsize=16)
+    plt.xlabel('State', fontsize=14)
+    plt.ylabel('ECLIR (%)', fontsize=14)
+    plt.xticks(rotation=90)
+    plt.ylim(0, 120) #limit bar to max value pretty print
+    plt.yticks(np.arange(10, 130, 6)) #step 6
+
+    # horizontal dashed lines on limit bars for clearer picture (---)
+    first_bar_position = 0
+    last_bar_position = len(state_ECLIR_sorted) - 1
+    first_bar_value = state_ECLIR_sorted.iloc[0]['state_eclir']
+    last_bar_value = state_ECLIR_sorted.iloc[-1]['state_eclir']
+
+    # plot
+    plt.plot([first_bar_position-1, first_bar_position], [first_bar_value, first_bar_value], color='purple', linestyle='dashed', linewidth=2)  # First bar lines --
+    plt.plot([last_bar_position, last_bar_position + 1], [last_bar_value, last_bar_value], color='purple', linestyle='dashed', linewidth=2)  # Last bar lines --
+    plt.tight_layout()
+    return fig
+
+def _error_bars(state_data, metric):
+    # 95% bootstrap intervals (uncertainty.py) of the bars, if the input has them
+    if f'{metric}_lower' not in state_data:
+        return
+    errors = [state_data[metric] - state_data[f'{metric}_lower'], state_data[f'{metric}_upper'] - state_data[metric]]
+    plt.errorbar(np.arange(len(state_data)), state_data[metric], yerr=errors,
+                 fmt='none', ecolor='#483D8B', elinewidth=1, capsize=3)
+
+# <--------------------------------------Housing Cost Burden-------------------------------------->
+
+def hcb(state_hcb_sorted):
+    import seaborn as sns
+
+    # visualize by barplot graph
+    fig = plt.figure(figsize=(16, 10))
+    sns.barplot(x='state', y='state_hcb', data=state_hcb_sorted, palette="Purples")
+    _error_bars(state_hcb_sorted, 'state_hcb')
+    plt.title('State-Level Housing Cost Burden (HCB)', fontsize=16)
+    plt.xlabel('State', fontsize=14)
+    plt.ylabel('Housing Cost Burden (%)', fontsize=14)
+    plt.xticks(rotation=90)
+    plt.ylim(0, 60) #limit for clearer view
+    plt.yticks(np.arange(2, 60, 4))  #step
+    plt.tight_layout()
+    return fig
+
+# <--------------------------------------Price to Income Ratio-------------------------------------->
+
+def pir_pie(category_counts):
+    # visualization: pie chart
+    fig = plt.figure(figsize=(8, 8))
+    category_counts.plot(kind='pie',
+                        autopct='%1.1f%%',
+                        startangle=90,
+                        colors=['#D3CCE3', '#A9A9C9', '#786D89', '#5E3A69'], #shades of purple
+                        wedgeprops={'edgecolor': 'black'},
+                        explode=(0, 0.1, 0.1, 0.1)) #sliced out
+    plt.title('Housing Price-to-Income Ratio')
+    plt.ylabel('')
+    plt.legend(labels=metrics.pir_categories, loc='lower right')
+    plt.axis('equal') #no x axis
+    return fig
+
+def pir_line(state_data):
+    # visualization: line chart
+    fig = plt.figure(figsize=(12, 6))
+    plt.plot(state_data['state'],
+             state_data['price_to_income_ratio'],
+             marker='^',
+             color='#483D8B',
+             linestyle='-',
+             linewidth=2,
+             markersize=8,
+             markerfacecolor='white',
+             markeredgewidth=2)
+    if 'price_to_income_ratio_lower' in state_data:
+        # 95% bootstrap interval band
+        plt.fill_between(state_data['state'], state_data['price_to_income_ratio_lower'],
+                         state_data['price_to_income_ratio_upper'], color='#483D8B', alpha=0.15)
+
+    plt.title('Price-to-Income Ratio Across U.S.', fontsize=18, fontweight='bold', color = '#483D8B')
+    plt.xlabel('State', fontsize=12)
+    plt.ylabel('Price-to-Income Ratio', fontsize=12)
+    plt.xticks(rotation=90, fontsize=10)
+    # include grid: clear view
+    plt.grid(True, linestyle=':', alpha=0.7, color = "black")
+    plt.tight_layout()
+    return fig
+
+# figure name -> builder, in the order of the analysis
+FIGURES = {
+    'cost_of_living_table': cost_of_living_table,
+    'house_listings_table': house_listings_table,
+    'area_map': area_map,
+    'expenses_by_state': expenses_by_state,
+    'price_boxplot': price_boxplot,
+    'eclir': eclir,
+    'hcb': hcb,
+    'pir_pie': pir_pie,
+    'pir_line': pir_line,
+}
+
+# <--------------------------------------Headless report-------------------------------------->
+
+def input_hash(name, data):
+    """ Hash of a figure's input data (values, index and columns) """
+    digest = hashlib.sha256(name.encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+    digest.update(repr(list(columns)).encode())
+    return digest.hexdigest()
+
+def figure_path(name, output_dir):
+    """ File of a rendered figure: the (interactive) map as HTML, the others as PNG """
+    return os.path.join(output_dir, f'{name}.html' if name == 'area_map' else f'{name}.png')
+
+def render_figure(name, data, output_dir):
+    """ Render one figure to a file with a non-interactive backend, returns the file path """
+    plt.switch_backend('Agg')
+    fig = FIGURES[name](data)
+    path = figure_path(name, output_dir)
+    if name == 'area_map':
+        fig.write_html(path, include_plotlyjs='cdn')
+    else:
+        fig.savefig(path, dpi=100, bbox_inches='tight')
+        plt.close(fig)
+    return path
+
+def render_report(df_cost_of_living, df_house_listings, output_dir=DEFAULT_REPORT_DIR, workers=None, force=False,
+                  area_data=None, state_data=None, intervals=False):
+    """ Render every figure whose input changed since the last report, concurrently.
+        area_data / state_data: materialized metrics (see read_report_tables), intervals: see figure_inputs.
+        A figure is skipped while its input, its rendering code and its file are unchanged; a figure
+        that fails (e.g. the map without state shapes) is reported as 'failed' and retried next time.
+        Returns {figure name: file path, 'unchanged' or 'failed'}. """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+
+    inputs = figure_inputs(df_cost_of_living, df_house_listings, area_data, state_data, intervals)
+    entries = {name: {'input': input_hash(name, inputs[name]), 'code': checkpoint.code_version(FIGURES[name]),
+                      'path': figure_path(name, output_dir)} for name in FIGURES}
+    outdated = [name for name in FIGURES
+                if force or manifest.get(name) != entries[name] or not os.path.exists(entries[name]['path'])]
+    results = {name: 'unchanged' for name in FIGURES if name not in outdated}
+
+    if outdated:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {name: pool.submit(render_figure, name, inputs[name], output_dir) for name in outdated}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                    manifest[name] = entries[name]
+                except Exception as error:
+                    print(f"Warning: {name} was skipped, it failed to render: {error!r}")
+                    results[name] = 'failed'
+                    manifest[name] = {**entries[name], 'error': repr(error)}
+                with open(manifest_path, 'w') as manifest_file:
+                    json.dump(manifest, manifest_file, indent=2)
+
+    for name, result in results.items():
+        print(f"{name}: {result}")
+    return results
+
+if __name__ == "__main__":
+    # report.py [output_dir] [--intervals]
+    arguments = [argument for argument in sys.argv[1:] if argument != '--intervals']
+    df_cost_of_living, df_house_listings, area_data, state_data = read_report_tables()
+    render_report(df_cost_of_living, df_house_listings, arguments[0] if arguments else DEFAULT_REPORT_DIR,
+                  area_data=area_data, state_data=state_data, intervals='--intervals' in sys.argv)
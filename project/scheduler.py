@@ -0,0 +1,58 @@
+""" Minimal DAG scheduler for the pipeline stages.
+
+    A stage runs as soon as all the stages it depends on are finished and receives
+    their results as arguments, in the order of its dependencies. Independent stages
+    run concurrently on a thread pool; stages that name the same lock (e.g. every
+    stage writing to SQLite) never run at the same time.
+
+    """
+
+import threading
+from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+@dataclass
+class Stage:
+    name: str
+    func: object
+    deps: tuple = ()
+    lock: str = None
+
+
+def run_stages(stages, max_workers=None):
+    """ Run the stage graph, returns {stage name: result}. The first failing stage
+        stops scheduling and its exception is raised once running stages are done. """
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Stage names must be unique!")
+    unknown = {dep for stage in stages for dep in stage.deps} - set(names)
+    if unknown:
+        raise ValueError(f"Unknown stage dependencies: {unknown}")
+
+    locks = defaultdict(threading.Lock)
+
+    def run(stage, args):
+        if stage.lock is None:
+            return stage.func(*args)
+        with locks[stage.lock]:
+            return stage.func(*args)
+
+    results = {}
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [stage for stage in pending.values() if all(dep in results for dep in stage.deps)]
+            for stage in ready:
+                del pending[stage.name]
+                running[pool.submit(run, stage, [results[dep] for dep in stage.deps])] = stage.name
+            if not running:
+                raise ValueError(f"Stage graph has a cycle: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+    return results
@@ -0,0 +1,45 @@
+""" State-partitioned parallel transformation.
+
+    Every transformation and cleaning step only looks at rows of the same state
+    (the MO median imputation included), so a source can be split by state,
+    transformed shard by shard on a process pool and merged back in the original
+    row order. The result is the same as transforming the whole frame at once.
+
+    """
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+
+def keep(df):
+    """ No-op step, e.g. the clean of a transform-only pass """
+    return df
+
+
+def _transform_shard(transform, clean, shard):
+    return clean(transform(shard))
+
+
+def shard_pool(workers):
+    """ Process pool for transform_sharded, to share between several passes """
+    # spawn: the pipeline runs stages on threads, forking a threaded process is unsafe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def transform_sharded(df, transform, clean, shard_column, workers, pool=None):
+    """ Split df by shard_column, run transform + clean per shard on workers processes (of pool,
+        a new one if not given) and merge the shards deterministically (original row order). """
+    # raw headers may still carry whitespace, the transformation strips it later
+    shard_column = next(column for column in df.columns if column.strip() == shard_column)
+    shards = [shard for _, shard in df.groupby(shard_column, dropna=False, sort=True, observed=True)]
+    if len(shards) < 2 or workers < 2:
+        return _transform_shard(transform, clean, df)
+    if pool is None:
+        with shard_pool(min(workers, len(shards))) as pool:
+            return transform_sharded(df, transform, clean, shard_column, workers, pool)
+
+    results = list(pool.map(_transform_shard, [transform] * len(shards), [clean] * len(shards), shards))
+    print(f"Transformed {len(shards)} shards by {shard_column} on {min(workers, len(shards))} processes")
+    return pd.concat(results).sort_index(kind='stable')
@@ -0,0 +1,105 @@
+""" County of every house listing, from its coordinates and a local boundary file.
+
+    The boundary file is a GeoJSON FeatureCollection of (Multi)Polygons in lon/lat, one
+    feature per county with the 'state' (two-letter code) and 'county' properties of the
+    cost_of_living table. The listings are bucketed into a regular grid of cells; each
+    county only tests the listings of the cells its bounding box covers, with an exact
+    even-odd ray casting test vectorized over listings and edges. The result is the
+    listing_area table (listing_id = rowid of house_listings, state, county), e.g.
+
+        SELECT a.county, h.property_price FROM house_listings h
+        JOIN listing_area a ON a.listing_id = h.rowid
+
+    """
+
+import json
+
+import numpy as np
+import pandas as pd
+
+MAPPING_TABLE = 'listing_area'
+CELL_DEGREES = 0.25
+MAX_PAIRS = 4_000_000  # listing x edge pairs tested at once
+
+
+def load_boundaries(path, state_property='state', county_property='county'):
+    """ Features of the boundary file: [(state, county, edges)], edges as x1, y1, x2, y2 rows """
+    with open(path) as boundary_file:
+        features = json.load(boundary_file)['features']
+    boundaries = []
+    for feature in features:
+        geometry = feature['geometry']
+        polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        edges = []
+        for ring in (ring for rings in polygons for ring in rings):
+            ring = np.asarray(ring, dtype='float64')[:, :2]
+            edges.append(np.hstack([ring, np.roll(ring, -1, axis=0)]))
+        properties = feature['properties']
+        boundaries.append((properties[state_property], properties[county_property], np.vstack(edges)))
+    if not boundaries:
+        raise ValueError(f"No boundaries in {path}!")
+    return boundaries
+
+
+def _inside(x, y, edges):
+    """ Even-odd test of the points against all rings of one polygon (holes included) """
+    x1, y1, x2, y2 = (edges[:, i] for i in range(4))
+    inside = np.zeros(len(x), dtype=bool)
+    step = max(1, MAX_PAIRS // len(edges))
+    for start in range(0, len(x), step):
+        px, py = x[start:start + step, None], y[start:start + step, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+        inside[start:start + step] = crossing.sum(axis=1) % 2 == 1
+    return inside
+
+
+def assign_boundaries(longitude, latitude, boundaries, cell_degrees=CELL_DEGREES):
+    """ Index of the boundary containing each point, -1 outside of all (or without coordinates) """
+    x, y = np.asarray(longitude, dtype='float64'), np.asarray(latitude, dtype='float64')
+    assigned = np.full(len(x), -1)
+    valid = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+    if not len(valid):
+        return assigned
+
+    # grid index: points sorted by cell, a cell row of a bounding box is one contiguous slice
+    x0, y0 = x[valid].min(), y[valid].min()
+    columns = int((y[valid].max() - y0) // cell_degrees) + 1
+    cells = ((x[valid] - x0) // cell_degrees).astype('int64') * columns + ((y[valid] - y0) // cell_degrees).astype('int64')
+    order = np.argsort(cells, kind='stable')
+    points, cells = valid[order], cells[order]
+    max_row = (x[valid].max() - x0) // cell_degrees
+
+    for number, (_, _, edges) in enumerate(boundaries):
+        left, right = edges[:, 0].min(), edges[:, 0].max()
+        bottom, top = edges[:, 1].min(), edges[:, 1].max()
+        row_from, row_to = max(0, (left - x0) // cell_degrees), min(max_row, (right - x0) // cell_degrees)
+        column_from, column_to = max(0, (bottom - y0) // cell_degrees), min(columns - 1, (top - y0) // cell_degrees)
+        if row_from > row_to or column_from > column_to:
+            continue
+        rows = np.arange(row_from, row_to + 1, dtype='int64') * columns
+        starts = np.searchsorted(cells, rows + int(column_from))
+        ends = np.searchsorted(cells, rows + int(column_to), side='right')
+        candidates = np.concatenate([points[start:end] for start, end in zip(starts, ends)])
+        candidates = candidates[(assigned[candidates] < 0) & (x[candidates] >= left) & (x[candidates] <= right)
+                                & (y[candidates] >= bottom) & (y[candidates] <= top)]
+        if len(candidates):
+            assigned[candidates[_inside(x[candidates], y[candidates], edges)]] = number
+    return assigned
+
+
+def build_listing_areas(engine, boundaries_path, cell_degrees=CELL_DEGREES):
+    """ Replace the listing_area table, returns the number of listings assigned to a county """
+    boundaries = load_boundaries(boundaries_path)
+    with engine.begin() as connection:
+        listings = pd.read_sql_query("SELECT rowid AS listing_id, longitude, latitude FROM house_listings "
+                                     "WHERE longitude IS NOT NULL AND latitude IS NOT NULL", connection)
+        assigned = assign_boundaries(listings['longitude'], listings['latitude'], boundaries, cell_degrees)
+        found = assigned >= 0
+        names = pd.DataFrame([(state, county) for state, county, _ in boundaries], columns=['state', 'county'])
+        mapping = names.iloc[assigned[found]].reset_index(drop=True)
+        mapping.insert(0, 'listing_id', listings['listing_id'].to_numpy()[found])
+        mapping.to_sql(MAPPING_TABLE, connection, if_exists='replace', index=False)
+    print(f"Assigned {found.sum()} of {len(listings)} listings to {mapping['county'].nunique()} counties "
+          f"({len(boundaries)} boundaries)")
+    return int(found.sum())
@@ -0,0 +1,52 @@
+""" Chunked streaming ingestion: CSV -> transform -> SQLite, with bounded memory.
+
+    Only one chunk of a source file is held in memory at a time. The chunk size is
+    either given in rows or derived from a memory ceiling (in MB).
+
+    """
+
+import pandas as pd
+
+from transforms import schema_dtypes
+
+SAMPLE_ROWS = 1000
+DEFAULT_CHUNK_ROWS = 50000
+# a chunk is held up to ~3 times while it is parsed, transformed and written
+CHUNK_OVERHEAD = 3
+
+
+def estimate_chunk_rows(csv_path, memory_limit_mb):
+    """ Rows per chunk that keep the ingestion below memory_limit_mb """
+    sample = pd.read_csv(csv_path, nrows=SAMPLE_ROWS)
+    if sample.empty:
+        return DEFAULT_CHUNK_ROWS
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    return max(1, int(memory_limit_mb * 1024 * 1024 / (bytes_per_row * CHUNK_OVERHEAD)))
+
+
+def stream_csv_to_sqlite(csv_path, table_name, engine, transform, dtypes, chunk_rows=None, memory_limit_mb=None,
+                         schema=None, drop_columns=(), predicate=None):
+    """ Read, transform and load csv_path chunk by chunk. The table is replaced by the first
+        chunk and appended to afterwards. dtypes pins the column types, so the schema does
+        not depend on what pandas infers from the first chunk. schema is the read-time schema
+        of the raw CSV columns, drop_columns / predicate the read-time pushdown (see
+        transforms.read_typed_csv). Returns the loaded row count. """
+    if chunk_rows is None:
+        chunk_rows = estimate_chunk_rows(csv_path, memory_limit_mb) if memory_limit_mb else DEFAULT_CHUNK_ROWS
+    print(f"Streaming CSV: {csv_path} in chunks of {chunk_rows} rows")
+
+    rows_loaded = 0
+    if_exists = 'replace'
+    usecols, read_dtypes = schema_dtypes(csv_path, schema or {}, drop_columns)
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, usecols=usecols, dtype=read_dtypes or None):
+        if predicate is not None:
+            chunk.columns = chunk.columns.str.strip()
+            chunk = chunk[predicate(chunk)]
+        chunk = transform(chunk).astype(dtypes)
+        chunk.to_sql(table_name, engine, if_exists=if_exists, index=False)
+        if_exists = 'append'
+        rows_loaded += len(chunk)
+
+    if if_exists == 'replace':
+        raise ValueError(f"{csv_path} has no rows to load!")
+    return rows_loaded
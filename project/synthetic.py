@@ -0,0 +1,220 @@
+""" Synthetic stand-ins for both data sources, at any size.
+
+    The generated files have the header, value ranges and missing-value patterns of
+    the real Kaggle CSV files (cost_of_living_us.csv and original_extracted_df.csv),
+    so the whole pipeline runs on them without network access. They are written into
+    a local mirror (<mirror_dir>/<owner>/<dataset>/*.csv, see PipelineConfig.mirror_dir)
+    chunk by chunk, so even 10M rows never sit in memory at once.
+
+    Usage: python project/synthetic.py <mirror directory> [rows, default 10000]
+
+    """
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+CHUNK_ROWS = 500_000
+
+# counties per state in the real dataset (3143 counties, 10 family types each)
+STATE_COUNTIES = {
+    'AL': 67, 'AK': 29, 'AZ': 15, 'AR': 75, 'CA': 58, 'CO': 64, 'CT': 8, 'DE': 3, 'DC': 1, 'FL': 67,
+    'GA': 159, 'HI': 5, 'ID': 44, 'IL': 102, 'IN': 92, 'IA': 99, 'KS': 105, 'KY': 120, 'LA': 64, 'ME': 16,
+    'MD': 24, 'MA': 14, 'MI': 83, 'MN': 87, 'MS': 82, 'MO': 115, 'MT': 56, 'NE': 93, 'NV': 17, 'NH': 10,
+    'NJ': 21, 'NM': 33, 'NY': 62, 'NC': 100, 'ND': 53, 'OH': 88, 'OK': 77, 'OR': 36, 'PA': 67, 'RI': 5,
+    'SC': 46, 'SD': 66, 'TN': 95, 'TX': 254, 'UT': 29, 'VT': 14, 'VA': 133, 'WA': 39, 'WV': 55, 'WI': 72,
+    'WY': 23,
+}
+
+# approximate (latitude, longitude) centre of every state, listings scatter around it
+STATE_CENTRES = {
+    'AL': (32.8, -86.8), 'AK': (61.4, -152.3), 'AZ': (34.2, -111.7), 'AR': (34.9, -92.4), 'CA': (37.2, -119.5),
+    'CO': (39.0, -105.5), 'CT': (41.6, -72.7), 'DE': (39.0, -75.5), 'DC': (38.9, -77.0), 'FL': (28.6, -82.4),
+    'GA': (32.7, -83.4), 'HI': (20.8, -156.3), 'ID': (44.4, -114.6), 'IL': (40.0, -89.2), 'IN': (39.9, -86.3),
+    'IA': (42.1, -93.5), 'KS': (38.5, -98.4), 'KY': (37.5, -85.3), 'LA': (31.1, -92.0), 'ME': (45.4, -69.2),
+    'MD': (39.0, -76.8), 'MA': (42.3, -71.8), 'MI': (44.3, -85.4), 'MN': (46.3, -94.3), 'MS': (32.7, -89.7),
+    'MO': (38.4, -92.5), 'MT': (47.0, -109.6), 'NE': (41.5, -99.8), 'NV': (39.3, -116.6), 'NH': (43.7, -71.6),
+    'NJ': (40.2, -74.7), 'NM': (34.4, -106.1), 'NY': (42.9, -75.5), 'NC': (35.6, -79.4), 'ND': (47.5, -100.5),
+    'OH': (40.3, -82.8), 'OK': (35.6, -97.5), 'OR': (43.9, -120.6), 'PA': (40.9, -77.8), 'RI': (41.7, -71.5),
+    'SC': (33.9, -80.9), 'SD': (44.4, -100.2), 'TN': (35.9, -86.4), 'TX': (31.5, -99.3), 'UT': (39.3, -111.7),
+    'VT': (44.1, -72.7), 'VA': (37.5, -78.9), 'WA': (47.4, -120.5), 'WV': (38.6, -80.6), 'WI': (44.6, -89.9),
+    'WY': (43.0, -107.6),
+}
+
+FAMILY_CODES = [f'{parents}p{children}c' for parents in (1, 2) for children in range(5)]
+
+# real missing-value rates
+MISSING_TOTAL_COST_MO = 10 / 31430      # total_cost, only MO rows
+EMPTY_LISTING_RATE = 0.02               # listings with every column empty
+MISSING_LISTING_RATES = {'Bedroom': 0.2, 'Bathroom': 0.2, 'LotArea': 0.25, 'MarketEstimate': 0.3,
+                         'RentEstimate': 0.3, 'Area': 0.05, 'Price': 0.01}
+ZERO_OR_ONE_RATE = 0.01                 # placeholder 0 / 1 in Area and Price
+
+SOURCE_FILES = {
+    'cost_of_living': ('asaniczka/us-cost-of-living-dataset-3171-counties', 'cost_of_living_us.csv'),
+    'house_listings': ('febinphilips/us-house-listings-2023', 'original_extracted_df.csv'),
+}
+
+
+def _states(rng, rows):
+    weights = np.array(list(STATE_COUNTIES.values()), dtype='float64')
+    return rng.choice(np.array(list(STATE_COUNTIES)), rows, p=weights / weights.sum())
+
+
+def generate_cost_of_living(rows, seed=0, start_id=1):
+    """ cost_of_living_us.csv-shaped frame: 10 family types per county, about 2.5 counties per area.
+        As in the real file, case_id numbers the counties (from start_id) and repeats across their family types """
+    rng = np.random.default_rng(seed)
+    counties = -(-rows // len(FAMILY_CODES))
+    county_state = _states(rng, counties)
+    county_number = pd.Series(county_state).groupby(county_state).cumcount().to_numpy()
+    county_metro = rng.random(counties) < 0.37
+    county_income = rng.lognormal(np.log(68000), 0.25, counties).round(2)
+    county_housing = rng.lognormal(np.log(10000), 0.3, counties)
+
+    county_area = np.array([f'{s} area {n // 2.5:.0f}' for s, n in zip(county_state, county_number)])
+    county_name = np.array([f'{s} county {n}' for s, n in zip(county_state, county_number)])
+
+    county = np.repeat(np.arange(counties), len(FAMILY_CODES))[:rows]
+    family = np.tile(np.arange(len(FAMILY_CODES)), counties)[:rows]
+    parents = family // 5 + 1
+    children = family % 5
+    state = county_state[county]
+
+    def costs(base, spread, per_parent=0.0, per_child=0.0):
+        scale = 1 + per_parent * (parents - 1) + per_child * children
+        return (rng.lognormal(np.log(base), spread, rows) * scale).round(4)
+
+    df = pd.DataFrame({
+        'case_id': start_id + county,
+        'state': state,
+        'isMetro': county_metro[county],
+        'areaname': county_area[county],
+        'county': county_name[county],
+        'family_member_count': np.array(FAMILY_CODES)[family],
+        'housing_cost': (county_housing[county] * (1 + 0.25 * (children > 0))).round(4),
+        'food_cost': costs(4000, 0.15, per_parent=0.8, per_child=0.5),
+        'transportation_cost': costs(11000, 0.15, per_parent=0.3, per_child=0.15),
+        'healthcare_cost': costs(5500, 0.2, per_parent=1.0, per_child=0.4),
+        'other_necessities_cost': costs(4500, 0.2, per_parent=0.5, per_child=0.3),
+        'childcare_cost': np.where(children > 0, costs(6000, 0.4, per_child=0.6), 0.0),
+        'taxes': costs(6500, 0.35, per_parent=0.6, per_child=0.1),
+    })
+    df['total_cost'] = df[['housing_cost', 'food_cost', 'transportation_cost', 'healthcare_cost',
+                           'other_necessities_cost', 'childcare_cost', 'taxes']].sum(axis=1).round(4)
+    df['median_family_income'] = county_income[county]
+
+    # the only missing values of the real data: a few total_cost values, all in MO
+    mo_rows = np.flatnonzero(state == 'MO')
+    missing = max(1, round(rows * MISSING_TOTAL_COST_MO)) if len(mo_rows) else 0
+    df.loc[rng.choice(mo_rows, min(missing, len(mo_rows)), replace=False), 'total_cost'] = np.nan
+    return df
+
+
+def generate_house_listings(rows, seed=0):
+    """ original_extracted_df.csv-shaped frame, listings scattered around the state centres """
+    rng = np.random.default_rng(seed)
+    state = _states(rng, rows)
+    centres = np.array([STATE_CENTRES[s] for s in STATE_COUNTIES])
+    state_code = pd.Categorical(state, categories=list(STATE_COUNTIES)).codes
+    centre = centres[state_code]
+    cities = np.array([[f'{s} city {n}' for n in range(40)] for s in STATE_COUNTIES])
+    streets = np.array([f'{n} Main St' for n in range(1, 10000)])
+
+    area = rng.lognormal(np.log(1800), 0.45, rows).round(0)
+    price_per_sq = rng.lognormal(np.log(220), 0.5, rows).round(2)
+    price = (area * price_per_sq).round(-3)
+    df = pd.DataFrame({
+        'State': state,
+        'City': cities[state_code, rng.integers(0, 40, rows)],
+        'Street': streets[rng.integers(0, len(streets), rows)],
+        'Zipcode': rng.integers(1000, 99950, rows),
+        'Latitude': (centre[:, 0] + rng.normal(0, 1.2, rows)).round(6),
+        'Longitude': (centre[:, 1] + rng.normal(0, 1.8, rows)).round(6),
+        'Bedroom': rng.integers(1, 7, rows).astype('float64'),
+        'Bathroom': rng.integers(1, 5, rows).astype('float64'),
+        'Area': area,
+        'PPSq': price_per_sq,
+        'LotArea': rng.lognormal(np.log(0.25), 1.0, rows).round(3),
+        'MarketEstimate': (price * rng.normal(1, 0.05, rows)).round(-3),
+        'RentEstimate': (price * 0.006).round(-1),
+        'Price': price,
+        'ConvertedLot': rng.lognormal(np.log(10000), 1.0, rows).round(1),
+        'LotUnit': rng.choice(['sqft', 'acres'], rows, p=[0.7, 0.3]),
+    })
+
+    for column, rate in MISSING_LISTING_RATES.items():
+        df.loc[rng.random(rows) < rate, column] = np.nan
+    for column in ('Area', 'Price'):
+        df.loc[rng.random(rows) < ZERO_OR_ONE_RATE, column] = rng.choice([0.0, 1.0])
+    # the price per square foot is derived, it is missing whenever price or area is
+    df.loc[df['Area'].isna() | df['Price'].isna(), 'PPSq'] = np.nan
+    df.loc[rng.random(rows) < EMPTY_LISTING_RATE] = np.nan
+    return df
+
+
+def generate_boundaries(df_cost_of_living, cell_degrees=1.0):
+    """ County boundary GeoJSON (spatial.py) of a generated cost_of_living frame: square cells
+        tiling the listings, each owned by the nearest state centre and one of its counties """
+    counties = df_cost_of_living.groupby('state', observed=True)['county'].unique()
+    centres = np.array([STATE_CENTRES[state] for state in counties.index])
+    latitudes = np.arange(centres[:, 0].min() - 8, centres[:, 0].max() + 8, cell_degrees)
+    longitudes = np.arange(centres[:, 1].min() - 10, centres[:, 1].max() + 10, cell_degrees)
+    features = []
+    owned = {state: 0 for state in counties.index}
+    for lat in latitudes:
+        for lon in longitudes:
+            nearest = np.argmin(np.hypot(centres[:, 0] - lat, centres[:, 1] - lon))
+            state = counties.index[nearest]
+            county = counties.iloc[nearest][owned[state] % len(counties.iloc[nearest])]
+            owned[state] += 1
+            ring = [[lon, lat], [lon + cell_degrees, lat], [lon + cell_degrees, lat + cell_degrees],
+                    [lon, lat + cell_degrees], [lon, lat]]
+            features.append({'type': 'Feature', 'properties': {'state': state, 'county': county},
+                             'geometry': {'type': 'Polygon', 'coordinates': [ring]}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def write_csv(generate, csv_path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """ Write a generated CSV chunk by chunk (every chunk has its own seed) """
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    written = 0
+    while written < rows:
+        chunk = min(chunk_rows, rows - written)
+        if generate is generate_cost_of_living:
+            # a chunk starts with a new county (the last one of the previous chunk may be partial)
+            df = generate(chunk, seed + written, start_id=-(-written // len(FAMILY_CODES)) + 1)
+        else:
+            df = generate(chunk, seed + written)
+        df.to_csv(csv_path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += chunk
+    return csv_path
+
+
+def write_mirror(mirror_dir, rows, seed=0, listing_rows=None):
+    """ Both source files with the given number of rows (listings default to the same count),
+        returns {table: csv path}. Existing files of the same size are reused. """
+    generators = {'cost_of_living': (generate_cost_of_living, rows),
+                  'house_listings': (generate_house_listings, listing_rows or rows)}
+    paths = {}
+    for table_name, (slug, csv_file) in SOURCE_FILES.items():
+        generate, table_rows = generators[table_name]
+        csv_path = os.path.join(mirror_dir, *slug.split('/'), csv_file)
+        marker = f'{csv_path}.rows'
+        if not (os.path.exists(csv_path) and os.path.exists(marker) and open(marker).read() == f'{table_rows}:{seed}'):
+            write_csv(generate, csv_path, table_rows, seed)
+            with open(marker, 'w') as marker_file:
+                marker_file.write(f'{table_rows}:{seed}')
+            print(f"Generated {table_rows} synthetic rows: {csv_path}")
+        paths[table_name] = csv_path
+    return paths
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise ValueError("Usage: python project/synthetic.py <mirror directory> [rows]")
+    size = sys.argv[2] if len(sys.argv) > 2 else '10k'
+    write_mirror(sys.argv[1], SIZES.get(size) or int(size))
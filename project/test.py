@@ -14,11 +14,24 @@
     """
 
 import os
+import json
 import subprocess
+from contextlib import closing
 import pytest
 import sqlite3
 import pandas as pd
 
+import dataset_cache
+import sqlalchemy as sql
+from incremental import load_incremental
+from scheduler import Stage, run_stages
+from indexes import full_scans
+import synthetic
+from instrumentation import RunReport
+from quality import profile_frame, check_thresholds
+from columnar import write_columnar, read_columnar
+from imputation import impute
+
 # Fixture
 @pytest.fixture
 def database_full_path():
@@ -51,34 +64,36 @@ def data_loading(database_full_path):
             database_connection.close()
 
 def test_null_values_in_columns(database_full_path):
-
-    try:
-        with sqlite3.connect(database_full_path) as database_connection:
-
-            columns_to_check = ['household_id', 'housing_expenses','total_household_expenses', 
-                                'food_expenses', 'transport_expenses', 'healthcare_expenses', 
-                                'other_necessities_expenses', 'childcare_expenses',
-                                'household_taxes', 'parents_per_household', 'children_per_household']
-            
-            for column in columns_to_check:
-                query_c = f"SELECT COUNT(*) FROM cost_of_living WHERE {column} IS NULL"
-                null_count = database_connection.execute(query_c).fetchone()[0]
-                assert null_count == 0, f"There are {null_count} null values in {column} column."
-
-            columns_to_check = ['state', 'property_area_meters', 'price_per_sq_meter', 'property_price']
-            
-            for column in columns_to_check:
-                query_h = f"SELECT COUNT(*) FROM house_listings WHERE {column} IS NULL"
-                null_count = database_connection.execute(query_h).fetchone()[0]
-                assert null_count == 0, f"There are {null_count} null values in {column} column."
+    # null counts profiled at load time (quality.py): one small table instead of a scan per column,
+    # the loaded tables are scanned only without it. A missing database, table or column fails the test.
+    with closing(sqlite3.connect(f'file:{database_full_path}?mode=ro', uri=True)) as database_connection:
+
+        tables = {row[0] for row in database_connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        null_counts = None
+        if 'data_quality' in tables:
+            null_query = "SELECT table_name, column_name, value FROM data_quality WHERE metric = 'nulls'"
+            null_counts = {(table, column): value for table, column, value in database_connection.execute(null_query)}
+
+        def count_nulls(table, column):
+            if null_counts is None:
+                return database_connection.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NULL").fetchone()[0]
+            assert (table, column) in null_counts, f"{table}.{column} is missing from the quality summary."
+            return null_counts[(table, column)]
+
+        columns_to_check = ['household_id', 'housing_expenses','total_household_expenses', 
+                            'food_expenses', 'transport_expenses', 'healthcare_expenses', 
+                            'other_necessities_expenses', 'childcare_expenses',
+                            'household_taxes', 'parents_per_household', 'children_per_household']
         
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
+        for column in columns_to_check:
+            null_count = count_nulls('cost_of_living', column)
+            assert null_count == 0, f"There are {null_count} null values in {column} column."
 
-    finally:
-        # Close database connection
-        if database_connection:
-            database_connection.close()
+        columns_to_check = ['state', 'property_area_meters', 'price_per_sq_meter', 'property_price']
+        
+        for column in columns_to_check:
+            null_count = count_nulls('house_listings', column)
+            assert null_count == 0, f"There are {null_count} null values in {column} column."
 
     # print("Null values check passed successfully!")
 
@@ -101,6 +116,318 @@ def test_imputation_method(database_full_path):
         if database_connection:
             database_connection.close()
 
+def test_dataset_cache_roundtrip(tmp_path):
+
+    cache_dir = str(tmp_path / 'cache')
+    csv_path = tmp_path / 'sample.csv'
+    csv_path.write_text('state,price\nMO,1\n')
+
+    dataset_cache.store('owner/dataset', 'v1', [str(csv_path)], cache_dir)
+    assert dataset_cache.lookup('owner/dataset', 'v2', cache_dir) is None, "Unknown version served from cache."
+
+    cached = dataset_cache.lookup('owner/dataset', cache_dir=cache_dir)
+    assert open(cached['sample.csv']).read() == csv_path.read_text(), "Cached content differs."
+
+    removed = dataset_cache.evict(cache_dir, max_bytes=0)
+    assert removed == [('owner/dataset', 'v1')], "Cache was not evicted."
+    assert dataset_cache.lookup('owner/dataset', cache_dir=cache_dir) is None
+
+def test_incremental_load_applies_delta():
+
+    engine = sql.create_engine('sqlite://')
+    df = pd.DataFrame({'household_id': [1, 2, 3], 'state': ['MO', 'CA', 'TX'], 'food_expenses': [1.0, 2.0, 3.0]})
+    assert load_incremental(df, 'cost_of_living', engine, 'household_id') == (3, 0, 0)
+    assert load_incremental(df, 'cost_of_living', engine, 'household_id') == (0, 0, 0), "Unchanged rows were reloaded."
+
+    df = pd.DataFrame({'household_id': [1, 3, 4], 'state': ['MO', 'TX', 'AL'], 'food_expenses': [1.0, 30.0, 4.0]})
+    assert load_incremental(df, 'cost_of_living', engine, 'household_id') == (1, 1, 1)
+
+    loaded = pd.read_sql_query("SELECT * FROM cost_of_living ORDER BY household_id", engine)
+    pd.testing.assert_frame_equal(loaded, df)
+
+def test_incremental_load_repeated_keys():
+    # as in the real file, household_id repeats across the family types of a county
+    engine = sql.create_engine('sqlite://')
+    df = pd.DataFrame({'household_id': [1, 1, 2, 2], 'parents_per_household': [1, 2, 1, 2],
+                       'food_expenses': [1.0, 2.0, 3.0, 4.0]})
+    key = ['household_id', 'parents_per_household']
+    assert load_incremental(df, 'cost_of_living', engine, key) == (4, 0, 0)
+    df.loc[1, 'food_expenses'] = 20.0
+    assert load_incremental(df, 'cost_of_living', engine, key) == (0, 1, 0)
+
+    with pytest.raises(ValueError, match='repeat the key'):
+        load_incremental(df, 'cost_of_living', engine, 'household_id')
+
+def test_stage_graph_order():
+
+    stages = [Stage('extract', lambda: 2),
+              Stage('double', lambda x: x * 2, deps=('extract',)),
+              Stage('square', lambda x: x ** 2, deps=('extract',)),
+              Stage('verify', lambda a, b: (a, b), deps=('double', 'square'))]
+    assert run_stages(stages)['verify'] == (4, 4)
+
+    with pytest.raises(ValueError):
+        run_stages([Stage('a', lambda b: b, deps=('b',)), Stage('b', lambda a: a, deps=('a',))])
+
+def test_run_report_counts_rows(tmp_path):
+
+    report = RunReport(str(tmp_path / 'run_report.json'))
+    drop_free = report.instrument('clean', lambda df: df[df['property_price'] > 1])
+    drop_free(pd.DataFrame({'property_price': [0.0, 1.0, 250000.0]}))
+    report.close()
+
+    step, = json.loads((tmp_path / 'run_report.json').read_text())['steps']
+    assert (step['name'], step['rows_in'], step['rows_out'], step['status']) == ('clean', 3, 1, 'ok')
+    assert step['wall_seconds'] >= 0 and step['peak_mb'] >= 0
+
+def test_quality_thresholds_fail_fast():
+
+    df = pd.DataFrame({'state': ['MO', 'CA', None], 'property_price': [0.0, 250000.0, 99000.0]})
+    profile = profile_frame(df, 'house_listings', zero_columns=['property_price']).set_index(['column_name', 'metric'])
+    assert profile.loc[('state', 'nulls'), 'value'] == 1
+    assert profile.loc[('property_price', 'zeros'), 'value'] == 1
+    assert profile.loc[('property_price', 'max'), 'value'] == 250000.0
+
+    with pytest.raises(ValueError, match='property_price zeros=1'):
+        check_thresholds(profile.reset_index(), {'zeros': 0})
+
+def test_quality_keys_of_real_shaped_data():
+    # case_id repeats across the 10 family types of a county, as in the real file
+    import pipeline, transforms
+    from quality import profile_table
+    source = pipeline.SOURCES['cost_of_living']
+    raw = synthetic.generate_cost_of_living(200)
+    assert raw['case_id'].nunique() == 20
+    df = transforms.clean_cost_of_living(transforms.transform_cost_of_living(raw))
+    check_thresholds(profile_frame(df, 'cost_of_living', source['key']), source['quality'])
+
+    engine = sql.create_engine('sqlite://')
+    df.to_sql('cost_of_living', engine, index=False)
+    with engine.connect() as connection:
+        profile = profile_table(connection, 'cost_of_living', source['key']).set_index(['column_name', 'metric'])
+        assert profile.loc[('*', 'duplicate_keys'), 'value'] == 0
+        profile = profile_table(connection, 'cost_of_living', 'household_id').set_index(['column_name', 'metric'])
+        assert profile.loc[('*', 'duplicate_keys'), 'value'] == 180
+
+def test_columnar_copy_roundtrip(tmp_path):
+
+    df = pd.DataFrame({'state': ['TX', 'MO', 'TX', 'AL'], 'property_price': [1.0, 2.0, 3.0, 4.0],
+                       'property_area_meters': [10.0, 20.0, 30.0, 40.0]})
+    write_columnar(df, 'house_listings', str(tmp_path))
+    assert os.path.isdir(tmp_path / 'house_listings' / 'state=TX'), "Table is not partitioned by state."
+
+    # same rows, order and columns as loaded
+    pd.testing.assert_frame_equal(read_columnar('house_listings', directory=str(tmp_path)), df)
+    prices = read_columnar('house_listings', ['property_price'], directory=str(tmp_path))
+    assert list(prices.columns) == ['property_price'] and prices['property_price'].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+def test_lazy_dataset_handles(tmp_path, monkeypatch):
+    import pipeline
+    dataset_dir = tmp_path / 'mirror' / 'owner' / 'dataset'
+    dataset_dir.mkdir(parents=True)
+    (dataset_dir / 'wanted.csv').write_text('state,price\nMO,1\n')
+    (dataset_dir / 'other.csv').write_text('not,a\nvalid"csv\n\n"')
+    monkeypatch.chdir(tmp_path)
+
+    url = "https://www.kaggle.com/datasets/owner/dataset"
+    dfs = pipeline.download_kaggle_datasets(url, 'data', offline=True, mirror_dir=str(tmp_path / 'mirror'))
+    assert sorted(dfs) == ['other.csv', 'wanted.csv'] and not dfs._dfs, "Files were parsed before being accessed."
+    assert dfs['wanted.csv']['price'].tolist() == [1]
+    assert list(dfs._dfs) == ['wanted.csv'], "Files other than the accessed one were parsed."
+
+    dfs = pipeline.download_kaggle_datasets(url, 'data', offline=True, mirror_dir=str(tmp_path / 'mirror'), files=['wanted.csv'])
+    assert list(dfs) == ['wanted.csv'], "Files that were not requested are exposed."
+    with pytest.raises(ValueError):
+        pipeline.download_kaggle_datasets(url, 'data', offline=True, mirror_dir=str(tmp_path / 'mirror'), files=['missing.csv'])
+
+def test_csv_pushdown_matches_full_read(tmp_path):
+    import transforms
+    csv_path = tmp_path / 'listings.csv'
+    synthetic.generate_house_listings(5000, seed=3).to_csv(csv_path, index=False)
+    schema = transforms.house_listings_schema
+    full = transforms.read_typed_csv(csv_path, schema)
+    full = transforms.clean_house_listings(transforms.transform_house_listings(full))
+    pushed = transforms.read_typed_csv(csv_path, schema, **transforms.house_listings_pushdown)
+    assert not set(transforms.columns_to_drop_2) & set(pushed.columns), "Dropped columns were parsed."
+    pushed = transforms.clean_house_listings(transforms.transform_house_listings(pushed))
+    pd.testing.assert_frame_equal(pushed, full)
+
+def test_state_shape_levels(tmp_path, monkeypatch):
+    import geometry
+    def write_states(path, size):
+        ring = [[-92, 38], [-92 + size, 38], [-92 + size, 38 + size], [-92, 38 + size], [-92, 38]]
+        features = [{'type': 'Feature', 'properties': {'name': 'Missouri'},
+                     'geometry': {'type': 'Polygon', 'coordinates': [ring]}}]
+        path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    monkeypatch.setenv('PIPELINE_GEOJSON', str(tmp_path / 'states.json'))
+    write_states(tmp_path / 'states.json', 1)
+    geo_dir = str(tmp_path / 'fresh' / 'geo')
+    assert geometry.state_geometry('Missouri', 'high', geo_dir, offline=True)['coordinates'][0][1] == [-91, 38]
+
+    write_states(tmp_path / 'states.json', 2)
+    assert geometry.state_geometry('Missouri', 'high', geo_dir, offline=True)['coordinates'][0][1] == [-90, 38], \
+        "The levels were not rebuilt from the changed source."
+
+    # no source shapes at all: nothing to draw offline
+    monkeypatch.setenv('PIPELINE_GEOJSON', str(tmp_path / 'missing.json'))
+    with pytest.raises(ValueError, match='Offline mode'):
+        geometry.load_states_geojson('low', str(tmp_path / 'empty'), offline=True)
+
+def test_listing_county_assignment(tmp_path):
+    from spatial import load_boundaries, assign_boundaries
+    square = lambda x, y, size: [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    features = [
+        # a county with a hole, the hole is another county
+        {'properties': {'state': 'MO', 'county': 'Outer'},
+         'geometry': {'type': 'Polygon', 'coordinates': [square(0, 0, 3), square(1, 1, 1)]}},
+        {'properties': {'state': 'MO', 'county': 'Inner'},
+         'geometry': {'type': 'Polygon', 'coordinates': [square(1, 1, 1)]}},
+        {'properties': {'state': 'KS', 'county': 'Islands'},
+         'geometry': {'type': 'MultiPolygon', 'coordinates': [[square(5, 0, 1)], [square(7, 0, 1)]]}},
+    ]
+    (tmp_path / 'counties.json').write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    boundaries = load_boundaries(tmp_path / 'counties.json')
+    longitude = [0.5, 1.5, 5.5, 7.5, 6.5, float('nan')]
+    latitude = [0.5, 1.5, 0.5, 0.5, 0.5, 0.5]
+    assigned = assign_boundaries(longitude, latitude, boundaries, cell_degrees=0.5)
+    assert assigned.tolist() == [0, 1, 2, 2, -1, -1], "Listings were assigned to the wrong counties."
+
+def test_concurrent_resumable_fetch(tmp_path, monkeypatch):
+    import fetch
+    monkeypatch.setattr(fetch, 'BACKOFF_SECONDS', 0.01)
+    for slug in ('owner/first', 'owner/second'):
+        (tmp_path / 'mirror' / slug).mkdir(parents=True)
+        (tmp_path / 'mirror' / slug / 'data.csv').write_text('id,value\n' + ''.join(f'{i},{i * 7}\n' for i in range(5000)))
+
+    with fetch.LocalDatasetServer(str(tmp_path / 'mirror'), fail_after=1000) as server:
+        transport = fetch.HTTPTransport(server.url, max_connections=1)
+        files = fetch.fetch_datasets(['owner/first', 'owner/second'], transport, str(tmp_path / 'cache'))
+        assert sorted(server.requests) == [('owner/first', 0), ('owner/first', 1000),
+                                           ('owner/second', 0), ('owner/second', 1000)], "Broken downloads were not resumed."
+        with pytest.raises(OSError):
+            fetch.fetch_dataset('owner/missing', transport, str(tmp_path / 'cache'))
+    for slug in files:
+        assert pd.read_csv(files[slug]['data.csv'])['value'].sum() == 7 * sum(range(5000))
+
+def test_fetch_credentials_stay_on_the_api_host(tmp_path):
+    # like Kaggle: the API host redirects the download to a storage host
+    import fetch
+    (tmp_path / 'mirror' / 'owner' / 'first').mkdir(parents=True)
+    (tmp_path / 'mirror' / 'owner' / 'first' / 'data.csv').write_text('id,value\n1,7\n')
+    with fetch.LocalDatasetServer(str(tmp_path / 'mirror')) as storage, \
+            fetch.LocalDatasetServer(str(tmp_path / 'mirror'), redirect_to=storage.url) as api:
+        transport = fetch.HTTPTransport(api.url, username='user', key='secret')
+        files = fetch.fetch_dataset('owner/first', transport, str(tmp_path / 'cache'))
+    assert pd.read_csv(files['data.csv'])['value'].tolist() == [7]
+    assert api.authorizations and all(api.authorizations), "The API host got no credentials."
+    assert storage.authorizations and not any(storage.authorizations), "Credentials were sent to the storage host."
+
+def test_bootstrap_intervals():
+    import metrics, transforms, uncertainty
+    df = transforms.clean_cost_of_living(transforms.transform_cost_of_living(synthetic.generate_cost_of_living(3000, seed=5)))
+    listings = transforms.clean_house_listings(transforms.transform_house_listings(synthetic.generate_house_listings(3000, seed=5)))
+    area_data = metrics.area_metrics(metrics.area_cube(df))
+    intervals = uncertainty.state_intervals(area_data, listings, resamples=500, seed=1)
+    assert set(intervals['metric']) == set(uncertainty.METRICS)
+    bounded = intervals.dropna()
+    assert ((bounded['lower'] <= bounded['estimate']) & (bounded['estimate'] <= bounded['upper'])).all(), \
+        "Point estimates fall outside their bootstrap intervals."
+    pd.testing.assert_frame_equal(intervals, uncertainty.state_intervals(area_data, listings, resamples=500, seed=1))
+
+    # the report only bootstraps when asked to
+    import report
+    assert list(report.figure_inputs(df, listings)['eclir'].columns) == ['state', 'state_eclir']
+    figures = report.figure_inputs(df, listings, intervals=True)
+    assert {'state_eclir_lower', 'state_eclir_upper'} <= set(figures['eclir'].columns)
+    assert {'price_to_income_ratio_lower', 'price_to_income_ratio_upper'} <= set(figures['pir_line'].columns)
+
+def test_benchmark_regressions_against_baseline():
+    from benchmark import compare
+    baseline = {'10k': {'load': {'seconds': 1.0, 'peak_mb': 100.0}, 'metrics': {'seconds': 0.01, 'peak_mb': 1.0}}}
+    results = {'10k': {'load': {'seconds': 1.2, 'peak_mb': 150.0},     # slower within the tolerance, hungrier beyond
+                       'metrics': {'seconds': 0.05, 'peak_mb': 2.0},   # 5x, but below the noise floor
+                       'indexes': {'seconds': 9.0, 'peak_mb': 90.0}},  # not in the baseline
+               '1m': {'load': {'seconds': 99.0, 'peak_mb': 999.0}}}
+    assert compare(results, baseline) == [('10k', 'load', 'peak_mb', 100.0, 150.0)]
+    assert compare(results, baseline, tolerance=0.1) == [('10k', 'load', 'seconds', 1.0, 1.2),
+                                                          ('10k', 'load', 'peak_mb', 100.0, 150.0)]
+    assert compare(results, baseline, tolerance=1.0) == []
+
+def test_cli_fast_start(tmp_path):
+    import sys
+    import cli
+    db_path = tmp_path / 'empty.sqlite'
+    sqlite3.connect(db_path).close()
+    script = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(cli.__file__))!r}); import cli; "
+              f"status = cli.main(['--timing', 'validate', '--db', {str(db_path)!r}]); "
+              f"print(sorted(m for m in ('pandas', 'numpy', 'sqlalchemy', 'matplotlib', 'kaggle') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+    assert 'Invalid: cost_of_living: missing' in result.stdout
+    assert result.stdout.strip().endswith('[]'), "validate imported heavy dependencies."
+    assert 'Startup:' in result.stderr, result.stderr
+    with sqlite3.connect(db_path) as connection:
+        assert not connection.execute("SELECT name FROM sqlite_master").fetchall(), "validate wrote to the database."
+
+    assert cli._settings(['workers=3', 'offline=1']).workers == 3
+    assert 'PIPELINE_WORKERS' not in os.environ, "Settings leaked into the environment."
+    with pytest.raises(ValueError):
+        cli._settings(['unknown=1'])
+
+def test_resume_from_checkpoints(tmp_path, monkeypatch, capsys):
+    import pipeline
+    synthetic.write_mirror(str(tmp_path / 'mirror'), 2_000)
+    monkeypatch.chdir(tmp_path)
+    settings = dict(offline=True, mirror_dir=str(tmp_path / 'mirror'), sink=str(tmp_path / 'db.sqlite'), workers=1,
+                    run_report='', checkpoint_dir=str(tmp_path / 'checkpoints'))
+
+    def killed(engine):
+        raise RuntimeError("killed")
+    with monkeypatch.context() as patch:
+        patch.setattr(pipeline, 'materialize_metrics', killed)
+        with pytest.raises(RuntimeError):
+            pipeline.main(**settings)
+    capsys.readouterr()
+
+    engine = pipeline.main(**settings)
+    output = capsys.readouterr().out
+    for table_name in pipeline.SOURCES:
+        assert f'Resumed transform_{table_name}' in output and f'Resumed load_{table_name}' in output, \
+            "The rerun did not resume from the checkpoints of the failed run."
+    assert 'Removed outdated database' not in output, "The database of the failed run was removed."
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT COUNT(*) FROM cost_of_living").scalar() == 2_000
+        assert connection.exec_driver_sql("SELECT COUNT(*) FROM state_metrics").scalar() > 0
+
+def test_provider_without_fingerprint_is_not_checkpointed(tmp_path):
+    # a plain callable provider: its data can change between runs without the key noticing
+    import pipeline
+    settings = dict(sink='sqlite://', workers=1, run_report='', checkpoint_dir=str(tmp_path / 'checkpoints'))
+    for rows in (1_000, 1_500):
+        frames = {'cost_of_living': synthetic.generate_cost_of_living(rows),
+                  'house_listings': synthetic.generate_house_listings(rows)}
+        engine = pipeline.main(sources=lambda table_name, source, config: frames[table_name].copy(), **settings)
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT COUNT(*) FROM cost_of_living").scalar() == rows, \
+                "A checkpoint of earlier source data was served."
+
+def test_group_wise_imputation():
+
+    df = pd.DataFrame({'state': ['MO', 'MO', 'MO', 'CA', 'CA'],
+                       'total_household_expenses': [1.0, None, 3.0, 10.0, None],
+                       'household_taxes': [None, 2.0, None, None, 5.0],
+                       'median_family_income': [None, 1.0, None, 2.0, None]})
+    rules = [{'column': 'total_household_expenses', 'strategy': 'median', 'by': ['state']},
+             {'column': 'household_taxes', 'strategy': 'ffill', 'by': ['state']},
+             {'column': 'median_family_income', 'strategy': 'constant', 'value': 0.0}]
+    df, filled = impute(df, rules)
+
+    assert df['total_household_expenses'].tolist() == [1.0, 2.0, 3.0, 10.0, 10.0]
+    assert df['household_taxes'].fillna(-1).tolist() == [-1, 2.0, 2.0, -1, 5.0], "Forward fill crossed groups."
+    assert df['median_family_income'].tolist() == [0.0, 1.0, 0.0, 2.0, 0.0]
+    counts = {(row.column, row.group): row.filled for row in filled.itertuples()}
+    assert counts == {('total_household_expenses', 'MO'): 1, ('total_household_expenses', 'CA'): 1,
+                      ('household_taxes', 'MO'): 1, ('median_family_income', '*'): 3}
+
 # Integration Tests
 def test_table_creation_duplicated(database_full_path):
 
@@ -204,15 +531,178 @@ def test_table_and_column_format(database_full_path):
         if database_connection:
             database_connection.close()
 
+def test_hot_queries_use_indexes(tmp_path):
+    import transforms
+    from indexes import create_indexes
+    engine = sql.create_engine(f'sqlite:///{tmp_path / "db.sqlite"}')
+    df = transforms.clean_cost_of_living(transforms.transform_cost_of_living(synthetic.generate_cost_of_living(2_000)))
+    listings = transforms.clean_house_listings(transforms.transform_house_listings(synthetic.generate_house_listings(2_000)))
+    df.to_sql('cost_of_living', engine, index=False)
+    listings.to_sql('house_listings', engine, index=False)
+    assert full_scans(engine), "The hot queries use indexes before any were created."
+
+    create_indexes(engine)
+    regressions = full_scans(engine)
+    assert not regressions, f"Hot queries scan whole tables: {regressions}"
+
 # System Test
-def test_end_to_end(database_full_path):
-    # Pipeline Execution
+def test_end_to_end(database_full_path, tmp_path):
+    # Pipeline Execution, its checkpoints and run report go to a temporary directory
     # result = subprocess.run(["bash", "pipeline.sh"], capture_output=True, text=True)
-    result = subprocess.run(["python", "./project/pipeline.py"], capture_output=True, text=True)
+    env = dict(os.environ, PIPELINE_CHECKPOINT_DIR=str(tmp_path / 'checkpoints'),
+               PIPELINE_RUN_REPORT=str(tmp_path / 'run_report.json'))
+    result = subprocess.run(["python", "./project/pipeline.py"], capture_output=True, text=True, env=env)
     assert result.returncode == 0, f"{result.stderr}: Pipeline execution failed!"
 
     # Output Files validation
     assert os.path.exists(database_full_path), f"Output file {database_full_path} was not found."
 
+def test_report_render_and_skip(tmp_path, monkeypatch):
+    import report, transforms
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('PIPELINE_OFFLINE', '1')  # no state shapes: the map cannot render
+    df = transforms.clean_cost_of_living(transforms.transform_cost_of_living(synthetic.generate_cost_of_living(1000)))
+    listings = transforms.clean_house_listings(transforms.transform_house_listings(synthetic.generate_house_listings(1000)))
+    output_dir = str(tmp_path / 'report')
+
+    results = report.render_report(df, listings, output_dir, workers=1)
+    assert results.pop('area_map') == 'failed', "The map rendered without state shapes."
+    assert all(os.path.exists(path) for path in results.values()), "A figure was not rendered."
+    with open(os.path.join(output_dir, report.MANIFEST_FILE)) as manifest_file:
+        assert 'error' in json.load(manifest_file)['area_map'], "The failure is not in the manifest."
+
+    os.remove(results['hcb'])
+    rerun = report.render_report(df, listings, output_dir, workers=1)
+    assert rerun['hcb'] == results['hcb'] and os.path.exists(results['hcb']), "A deleted figure was not rendered again."
+    assert rerun['area_map'] == 'failed'
+    assert all(rerun[name] == 'unchanged' for name in results if name != 'hcb'), "Unchanged figures were rendered again."
+
+    # a figure rendered by other code is rendered again
+    manifest_path = os.path.join(output_dir, report.MANIFEST_FILE)
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    manifest['pir_pie']['code'] = 'older'
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    assert report.render_report(df, listings, output_dir, workers=1)['pir_pie'] == results['pir_pie']
+
+def test_report_reads_materialized_metrics(tmp_path):
+    import pipeline, report, metrics
+    db_path = str(tmp_path / 'db.sqlite')
+    sources = {'cost_of_living': synthetic.generate_cost_of_living(3_000),
+               'house_listings': synthetic.generate_house_listings(3_000)}
+    pipeline.main(sources=sources, sink=db_path, run_report='', checkpoints=False, workers=1)
+    df_cost_of_living, df_house_listings, area_data, state_data = report.read_report_tables(db_path)
+    assert area_data is not None and len(df_cost_of_living) == report.TABLE_ROWS, "The metrics were recomputed."
+
+    # baseline: plain groupbys over the full tables
+    with sqlite3.connect(db_path) as connection:
+        full = pd.read_sql_query("SELECT * FROM cost_of_living", connection)
+    by_area = full.groupby(['state', 'areaname'])
+    eclir_area = by_area[metrics.essential_expenses].median().sum(axis=1) / by_area['median_family_income'].mean() * 100
+    weights = by_area['total_household_expenses'].sum()
+    eclir = (eclir_area * weights).groupby(level='state').sum() / weights.groupby(level='state').sum()
+    income = (by_area['median_family_income'].mean()).groupby(level='state').median()
+    pir = df_house_listings.groupby('state')['property_price'].median() / income
+    state_data = state_data.set_index('state')
+    pd.testing.assert_series_equal(state_data['state_eclir'], eclir, check_names=False)
+    pd.testing.assert_series_equal(state_data['price_to_income_ratio'], pir.reindex(state_data.index), check_names=False)
+
+    # figures from the materialized metrics match the ones computed from the full tables
+    materialized = report.figure_inputs(df_cost_of_living, df_house_listings, area_data, state_data.reset_index())
+    computed = report.figure_inputs(full, df_house_listings)
+    for name in ('area_map', 'expenses_by_state', 'pir_pie'):
+        pd.testing.assert_frame_equal(pd.DataFrame(materialized[name]).reset_index(drop=True),
+                                      pd.DataFrame(computed[name]).reset_index(drop=True), check_dtype=False)
+
+def test_metrics_rebuild_when_rows_move_between_states(tmp_path):
+    import pipeline, report
+    from metrics import materialize_metrics
+    db_path = str(tmp_path / 'db.sqlite')
+    sources = {'cost_of_living': synthetic.generate_cost_of_living(3_000),
+               'house_listings': synthetic.generate_house_listings(3_000)}
+    engine = pipeline.main(sources=sources, sink=db_path, run_report='', checkpoints=False, workers=1)
+    assert not materialize_metrics(engine), "Unchanged sources rebuilt the metrics."
+    _, before = report.read_metrics(db_path)
+
+    # the row count and the column totals stay the same
+    with engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE house_listings SET state = 'GA' WHERE state = 'TX'")
+    assert report.read_metrics(db_path) is None, "Outdated metrics were served."
+    assert materialize_metrics(engine), "The metrics were not rebuilt after rows moved between states."
+    _, after = report.read_metrics(db_path)
+    before, after = (df.set_index('state')['price_to_income_ratio'] for df in (before, after))
+    assert not pd.isna(before['TX']) and pd.isna(after['TX']), "TX kept the PIR of its moved listings."
+
+def test_end_to_end_in_memory(tmp_path):
+    # Pipeline as a library call: fixture dataframes into an in-memory database
+    import pipeline
+    sources = {'cost_of_living': synthetic.generate_cost_of_living(2_000),
+               'house_listings': synthetic.generate_house_listings(2_000)}
+    engine = pipeline.main(sources=sources, sink='sqlite://', run_report=str(tmp_path / 'run_report.json'),
+                           checkpoint_dir=str(tmp_path / 'checkpoints'))
+
+    with engine.connect() as connection:
+        count = connection.exec_driver_sql("SELECT COUNT(*) FROM cost_of_living").scalar()
+        states = connection.exec_driver_sql("SELECT COUNT(*) FROM state_metrics").scalar()
+    assert count == 2_000, "Fixture rows are missing."
+    assert states > 0, "Metrics were not materialized."
+    assert sources['cost_of_living'].shape[1] == 15, "The fixture dataframe was modified."
+
+def _load_synthetic(tmp_path, name, **settings):
+    """ Source tables of a pipeline run over the synthetic CSV files of tmp_path/sources """
+    import pipeline
+    source_dir = tmp_path / 'sources'
+    if not source_dir.exists():
+        source_dir.mkdir()
+        synthetic.write_csv(synthetic.generate_cost_of_living,
+                            str(source_dir / pipeline.SOURCES['cost_of_living']['file']), 5_000)
+        synthetic.write_csv(synthetic.generate_house_listings,
+                            str(source_dir / pipeline.SOURCES['house_listings']['file']), 5_000)
+    settings = {'checkpoints': False, 'run_report': '', 'workers': 1, **settings}
+    engine = pipeline.main(sources=str(source_dir), sink=str(tmp_path / f'{name}.sqlite'), **settings)
+    with engine.connect() as connection:
+        return {table_name: pd.read_sql_query(f"SELECT * FROM {table_name}", connection)
+                for table_name in pipeline.SOURCES}
+
+def _assert_same_tables(tables, expected):
+    for table_name, df in expected.items():
+        pd.testing.assert_frame_equal(tables[table_name], df, check_dtype=False, obj=table_name)
+
+def test_streaming_load_matches_default(tmp_path):
+    _assert_same_tables(_load_synthetic(tmp_path, 'streaming', streaming=True, chunk_rows=700),
+                        _load_synthetic(tmp_path, 'default'))
+
+def test_bulk_load_matches_default(tmp_path):
+    _assert_same_tables(_load_synthetic(tmp_path, 'bulk', bulk_load=True), _load_synthetic(tmp_path, 'default'))
+    # the WAL mode of the load is not left behind in the database file
+    with sqlite3.connect(tmp_path / 'bulk.sqlite') as database_connection:
+        assert database_connection.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    assert not os.path.exists(tmp_path / 'bulk.sqlite-wal'), "The bulk load left a WAL file."
+
+def test_sharded_transform_matches_default(tmp_path):
+    sharded = _load_synthetic(tmp_path, 'sharded', shard_workers=2, run_report=str(tmp_path / 'run_report.json'))
+    steps = {step['name']: step for step in json.loads((tmp_path / 'run_report.json').read_text())['steps']}
+    for table_name, df in sharded.items():
+        transform, clean = steps[f'transform_{table_name}.transform'], steps[f'transform_{table_name}.clean']
+        assert transform['rows_out'] == clean['rows_in'] and clean['rows_out'] == len(df), \
+            "The sharded steps are missing from the run report."
+    _assert_same_tables(sharded, _load_synthetic(tmp_path, 'default'))
+    _assert_same_tables(_load_synthetic(tmp_path, 'sharded_again', shard_workers=2), sharded)
+
+def test_end_to_end_synthetic(tmp_path):
+    # Pipeline Execution, offline on generated data
+    synthetic.write_mirror(str(tmp_path / 'mirror'), 10_000)
+    env = dict(os.environ, PIPELINE_OFFLINE='1', PIPELINE_MIRROR_DIR=str(tmp_path / 'mirror'))
+    pipeline_path = os.path.join(os.path.dirname(__file__), 'pipeline.py')
+    result = subprocess.run(["python", pipeline_path], capture_output=True, text=True, cwd=tmp_path, env=env)
+    assert result.returncode == 0, f"{result.stderr}: Pipeline execution failed!"
+
+    with sqlite3.connect(tmp_path / 'data' / 'train_data.sqlite') as database_connection:
+        count = database_connection.execute("SELECT COUNT(*) FROM cost_of_living").fetchone()[0]
+        assert count == 10_000, "Generated rows are missing."
+        nulls = database_connection.execute("SELECT COUNT(*) FROM cost_of_living WHERE total_household_expenses IS NULL").fetchone()[0]
+        assert nulls == 0, "Generated MO gaps were not imputed."
+
 if __name__ == '__main__':
     pytest.main()
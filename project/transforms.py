@@ -0,0 +1,180 @@
+""" Transformation and cleaning steps of both data sources.
+
+    Every transformation works row by row, so it can be applied to a whole dataframe
+    or to one chunk of it at a time. Cleaning steps may need the whole column (medians).
+
+    """
+
+import pandas as pd
+
+from imputation import impute
+
+PUSHDOWN_CHUNK_ROWS = 200_000
+
+def schema_dtypes(csv_path, schema, drop_columns=()):
+    """ read_csv usecols and dtypes of a schema, matched against the raw (possibly unstripped)
+        header. Columns in drop_columns are left out, so they are never parsed. """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [column for column in header if column.strip() not in drop_columns]
+    return usecols, {column: schema[column.strip()] for column in usecols if column.strip() in schema}
+
+def downcast_floats(df):
+    """ float64 -> float32 for every column where no value changes """
+    for column in df.select_dtypes('float64').columns:
+        narrowed = df[column].astype('float32')
+        if narrowed.astype('float64').equals(df[column]):
+            df[column] = narrowed
+    return df
+
+def read_typed_csv(csv_path, schema, drop_columns=(), predicate=None):
+    """ Read a source CSV with its declared schema, then narrow the floats.
+        Pushdown: drop_columns are never parsed; predicate(chunk) -> mask of the rows to keep
+        is applied chunk by chunk while reading, so rejected rows never pile up. """
+    usecols, dtypes = schema_dtypes(csv_path, schema, drop_columns)
+    if predicate is None:
+        df = pd.read_csv(csv_path, usecols=usecols, dtype=dtypes)
+    else:
+        chunks = []
+        for chunk in pd.read_csv(csv_path, usecols=usecols, dtype=dtypes, chunksize=PUSHDOWN_CHUNK_ROWS):
+            chunk.columns = chunk.columns.str.strip()
+            chunks.append(chunk[predicate(chunk)])
+        df = pd.concat(chunks)
+        # categories differ from chunk to chunk
+        categories = [column for column, dtype in dtypes.items() if dtype == 'category']
+        df = df.astype({column.strip(): 'category' for column in categories})
+    df.columns = df.columns.str.strip()
+    return downcast_floats(df)
+
+def parse_family_code(family_member_count):
+    """ '1p2c' -> 1 parent, 2 children. Every distinct code is parsed once, rows only look it up """
+    codes = family_member_count.astype('category')
+    if (codes.cat.codes < 0).any():
+        raise ValueError("Missing family_member_count values!")
+    parsed = codes.cat.categories.to_series().str.extract(r'(\d+)p(\d+)c').astype('int32')
+    return parsed[0].to_numpy()[codes.cat.codes], parsed[1].to_numpy()[codes.cat.codes]
+
+# Data source 1: US Households Cost of Living dataset
+
+columns_to_drop_1 = ['isMetro', 'family_member_count'] #irrelevant (areaname and county are kept for the area metrics)
+
+# read-time pushdown: columns that are never needed are not parsed (family_member_count is, for the household sizes)
+cost_of_living_pushdown = {'drop_columns': ['isMetro']}
+
+# read-time schema, columns not listed here are inferred by pandas
+cost_of_living_schema = {
+    'case_id': 'int64', 'state': 'category', 'areaname': 'category', 'county': 'category',
+    'family_member_count': 'category',
+    'housing_cost': 'float64', 'food_cost': 'float64', 'transportation_cost': 'float64',
+    'healthcare_cost': 'float64', 'other_necessities_cost': 'float64', 'childcare_cost': 'float64',
+    'taxes': 'float64', 'total_cost': 'float64', 'median_family_income': 'float64',
+}
+
+# rename columns for calculation convenience for the next #Issues
+columns_to_rename_1 = {
+    'case_id': 'household_id',
+    'housing_cost': 'housing_expenses',
+    'food_cost': 'food_expenses',
+    'transportation_cost': 'transport_expenses',
+    'healthcare_cost': 'healthcare_expenses',
+    'other_necessities_cost': 'other_necessities_expenses',
+    'childcare_cost': 'childcare_expenses',
+    'taxes': 'household_taxes',
+    'total_cost': 'total_household_expenses',
+}
+
+# column types of the loaded table
+cost_of_living_dtypes = {
+    'household_id': 'int64', 'state': 'object', 'areaname': 'object', 'county': 'object',
+    'housing_expenses': 'float64', 'food_expenses': 'float64', 'transport_expenses': 'float64',
+    'healthcare_expenses': 'float64', 'other_necessities_expenses': 'float64', 'childcare_expenses': 'float64',
+    'household_taxes': 'float64', 'total_household_expenses': 'float64', 'median_family_income': 'float64',
+    'parents_per_household': 'int32', 'children_per_household': 'int32',
+}
+
+def transform_cost_of_living(df):
+    """ Data Transformation """
+    df.columns = df.columns.str.strip()
+
+    df['parents_per_household'], df['children_per_household'] = parse_family_code(df['family_member_count'])
+
+    df.drop(columns=columns_to_drop_1, inplace=True, errors='ignore')  # pushed down columns are already gone
+    df.rename(columns=columns_to_rename_1, inplace=True)
+    return df
+
+# missing values: per-column strategy within group keys (see imputation.py)
+cost_of_living_imputation = [
+    {'column': 'total_household_expenses', 'strategy': 'median', 'by': ['state']},
+]
+
+def clean_cost_of_living(df):
+    """
+    Data Cleaning
+    During data cleaning there were 10 missing values for overall dataframe.
+    During filtering the missing values were part of 'MO' state.
+    Since there are 1161 values for that state, we will use imputation median fill method
+    (the median of each state, so new gaps in other states are covered as well).
+
+    """
+    df, _ = impute(df, cost_of_living_imputation)
+    return df
+
+# Data source 2: US House Listings Prices dataset
+
+columns_to_drop_2 = ['City', 'Street', 'Zipcode',  #irrelevant (for now)
+                     'Bedroom', 'Bathroom', 'LotArea',  #too many nan and missing values
+                     'MarketEstimate', 'RentEstimate',  #irrelevant
+                     'ConvertedLot', 'LotUnit'] #irrelevant
+                     # Latitude / Longitude are kept for the county of each listing (spatial.py)
+
+house_listings_schema = {
+    'State': 'category', 'City': 'category', 'LotUnit': 'category',
+    'Area': 'float64', 'PPSq': 'float64', 'Price': 'float64', 'Latitude': 'float64', 'Longitude': 'float64',
+}
+
+columns_to_rename_2 = {
+    'State': 'state',
+    'Area': 'property_area_meters',
+    'PPSq': 'price_per_sq_meter',
+    'Price': 'property_price',
+    'Latitude': 'latitude',
+    'Longitude': 'longitude',
+}
+
+house_listings_dtypes = {
+    'state': 'object', 'property_area_meters': 'float64', 'price_per_sq_meter': 'float64', 'property_price': 'float64',
+    'latitude': 'float64', 'longitude': 'float64',
+}
+
+def transform_house_listings(df):
+    """ Data Transformation """
+    df.drop(columns=columns_to_drop_2, inplace=True, errors='ignore')  # pushed down columns are already gone
+    df.rename(columns=columns_to_rename_2, inplace=True)
+    return df
+
+def clean_house_listings(df):
+    """
+    Data Cleaning
+    During data cleaning there were around 5k missing values out of 24k rows of data.
+    We will drop rows with missing values in all columns to avoid reducing variance.
+    We will drop logical incorrect data rows per columns.
+
+    """
+    # rows with missing values in all columns have no price either, one mask covers every rule
+    keep = valid_listings(df['property_price'], df['property_area_meters'])
+    if keep.all():
+        return df  # already filtered while reading
+    return df[keep]
+
+def valid_listings(price, area):
+    """ Rows with a real price and area (0 and 1 are placeholders) """
+    return price.notna() & ~price.isin([0, 1]) & area.notna() & ~area.isin([0, 1])
+
+# read-time pushdown: the dropped columns are not parsed, invalid listings not kept (raw column names)
+house_listings_pushdown = {
+    'drop_columns': columns_to_drop_2,
+    'predicate': lambda chunk: valid_listings(chunk['Price'], chunk['Area']),
+}
+
+def transform_and_clean_house_listings(df):
+    """ Both steps work row by row, so streamed chunks go through them at once """
+    return clean_house_listings(transform_house_listings(df))
@@ -0,0 +1,115 @@
+""" Bootstrap confidence intervals of the state metrics (metrics.py).
+
+    Every state is resampled at once, in batches of NumPy arrays:
+
+    ECLIR / HCB are weighted means of the area values of a state. The areas are resampled
+    within their state as one (resamples x areas) index matrix per batch and the weighted
+    sums of all states are reduced with np.add.reduceat.
+
+    PIR is the median house price of a state over the median of its area incomes. The
+    median of a resample only depends on which order statistics are drawn: the m-th
+    smallest of n uniform draws is Beta(m, n - m + 1) distributed, so the bootstrap
+    medians are sampled directly from the sorted values, however many listings a state has.
+
+    Batches can be fanned out to a process pool (workers > 1).
+
+    """
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+RESAMPLES = 10_000
+CONFIDENCE = 0.95
+BATCH_ELEMENTS = 8_000_000  # resampled area values held at once per batch
+METRICS = ['state_eclir', 'state_hcb', 'price_to_income_ratio']
+
+
+def _by_state(states, *columns):
+    """ Rows sorted by state (then by the first column), the start and size of every state """
+    states = np.asarray(states).astype(str)
+    order = np.lexsort((columns[0], states))
+    names, starts, sizes = np.unique(states[order], return_index=True, return_counts=True)
+    return names, starts, sizes, [np.asarray(column, dtype='float64')[order] for column in columns]
+
+
+def resample_positions(starts, sizes, resamples, rng):
+    """ (resamples x rows) positions of the sorted rows, every row redrawn within its own state """
+    row_starts, row_sizes = np.repeat(starts, sizes), np.repeat(sizes, sizes)
+    return row_starts + (rng.random((resamples, len(row_starts))) * row_sizes).astype('int64')
+
+
+def weighted_means(values, weights, positions, starts):
+    """ (resamples x states) weighted means of the resampled rows of every state """
+    weighted = np.add.reduceat((values * weights)[positions], starts, axis=1)
+    return weighted / np.add.reduceat(weights[positions], starts, axis=1)
+
+
+def bootstrap_medians(sorted_values, starts, sizes, resamples, rng):
+    """ (resamples x states) medians (as np.median) of every state resampled, from the order statistics """
+    lower = (sizes + 1) // 2
+    even = sizes % 2 == 0
+    u_lower = rng.beta(lower, sizes - lower + 1, (resamples, len(sizes)))
+    # the next order statistic: the smallest of the n - m draws above the m-th
+    u_upper = u_lower + (1 - u_lower) * rng.beta(1, np.maximum(sizes - lower, 1), (resamples, len(sizes)))
+    at = lambda u: sorted_values[starts + np.minimum((u * sizes).astype('int64'), sizes - 1)]
+    return np.where(even, (at(u_lower) + at(u_upper)) / 2, at(u_lower))
+
+
+def _resample_batch(arrays, resamples, seed):
+    rng = np.random.default_rng(seed)
+    starts, sizes = arrays['starts'], arrays['sizes']
+    positions = resample_positions(starts, sizes, resamples, rng)
+    return {
+        'state_eclir': weighted_means(arrays['eclir'], arrays['eclir_weights'], positions, starts),
+        'state_hcb': weighted_means(arrays['hcb'], arrays['hcb_weights'], positions, starts),
+        'median_income_state': bootstrap_medians(arrays['incomes'], starts, sizes, resamples, rng),
+        'median_house_price_state': bootstrap_medians(arrays['prices'], arrays['price_starts'],
+                                                      arrays['price_sizes'], resamples, rng),
+    }
+
+
+def state_intervals(area_data, df_house_listings, resamples=RESAMPLES, confidence=CONFIDENCE, seed=0, workers=1):
+    """ Percentile bootstrap intervals of ECLIR, HCB and PIR per state (area_data: metrics.area_metrics).
+        Returns a long frame: state, metric, estimate, lower, upper """
+    area_data = area_data.dropna(subset=['eclir_area', 'hcb_area', 'median_income_area'])
+    listings = df_house_listings.dropna(subset=['state', 'property_price'])
+    states, starts, sizes, (eclir, hcb, eclir_weights, hcb_weights) = _by_state(
+        area_data['state'], area_data['eclir_area'], area_data['hcb_area'],
+        area_data['total_area_expenses'], area_data['total_area_housing_expenses'])
+    *_, (incomes,) = _by_state(area_data['state'], area_data['median_income_area'])
+    price_states, price_starts, price_sizes, (prices,) = _by_state(listings['state'], listings['property_price'])
+    arrays = {'starts': starts, 'sizes': sizes, 'eclir': eclir, 'hcb': hcb, 'eclir_weights': eclir_weights,
+              'hcb_weights': hcb_weights, 'incomes': incomes, 'prices': prices,
+              'price_starts': price_starts, 'price_sizes': price_sizes}
+
+    batch = max(1, BATCH_ELEMENTS // max(1, len(eclir)))
+    counts = [min(batch, resamples - done) for done in range(0, resamples, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    if workers > 1 and len(counts) > 1:
+        # spawn: the pipeline runs stages on threads, forking a threaded process is unsafe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(counts)), mp_context=context) as pool:
+            batches = list(pool.map(_resample_batch, [arrays] * len(counts), counts, seeds))
+    else:
+        batches = [_resample_batch(arrays, count, batch_seed) for count, batch_seed in zip(counts, seeds)]
+    replicates = {name: np.concatenate([result[name] for result in batches]) for name in batches[0]}
+
+    incomes = pd.DataFrame(replicates.pop('median_income_state'), columns=states)
+    prices = pd.DataFrame(replicates.pop('median_house_price_state'), columns=price_states)
+    replicates = {name: pd.DataFrame(values, columns=states) for name, values in replicates.items()}
+    replicates['price_to_income_ratio'] = (prices / incomes).reindex(columns=states)
+
+    estimates = metrics.state_metrics(area_data, df_house_listings).set_index('state')
+    alpha = (1 - confidence) / 2
+    intervals = []
+    for metric in METRICS:
+        lower, upper = replicates[metric].quantile([alpha, 1 - alpha]).to_numpy()
+        intervals.append(pd.DataFrame({'state': states, 'metric': metric,
+                                       'estimate': estimates[metric].reindex(states).to_numpy(),
+                                       'lower': lower, 'upper': upper}))
+    return pd.concat(intervals, ignore_index=True)